@@ -6,6 +6,11 @@ import os
 import psutil
 from scanner_engine import ScannerEngine
 from system_scanner import SystemScanner
+from parallel_scanner import ParallelScanner
+from file_walker import WalkRules
+from sentinel import Sentinel
+from ui_bus import UIBus, append_lines, FRAME_MS
+from archive_scanner import container_path
 
 # --- THEME CONFIG ---
 THEME = {
@@ -19,6 +24,19 @@ THEME = {
     "btn_fg": "#58a6ff"    # Cyan/Blueish for buttons
 }
 
+# Trees watched (recursively) by the real-time sentinel
+SENTINEL_WATCH = [os.path.join(os.path.expanduser("~"), "Downloads")]
+
+# Directory names pruned from quick/full/custom scans (matched case-insensitively on Windows)
+SCAN_EXCLUDE = ["Windows"]
+
+# Look inside zip/jar/tar/gzip/bz2/xz files during scans (members are reported as archive.zip!/member)
+SCAN_ARCHIVES = True
+
+# Per-stage scan timings: summarised in the live terminal and dumped for Prometheus (textfile collector)
+METRICS_INTERVAL_MS = 30_000
+METRICS_DUMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_metrics.prom")
+
 class AntivirusApp:
     def __init__(self, root):
         self.root = root
@@ -26,14 +44,57 @@ class AntivirusApp:
         self.root.geometry("1100x750")
         self.root.configure(bg=THEME["bg"])
 
-        self.engine = ScannerEngine()
-        self.sys_scanner = SystemScanner()
+        # One engine for the whole app; model and signatures load in the background so the window paints first
+        self.engine = ScannerEngine(background=True)
+        self.sys_scanner = SystemScanner(self.engine)
         self.monitoring = False
+        self.sentinel = None
         self.scan_thread = None
+        self.parallel = None
+        self.bus = UIBus() # Worker threads never touch widgets: they post here and _pump_ui applies it
 
         self._apply_styles()
         self._setup_ui()
         self.toggle_monitor() 
+        self._wait_for_engine()
+        self._metrics_seen = 0
+        self.root.after(METRICS_INTERVAL_MS, self._report_metrics)
+        self.root.after(FRAME_MS, self._pump_ui)
+
+    def _pump_ui(self):
+        # Tk thread: apply everything workers posted since the last frame, one widget call per batch where possible
+        batch = self.bus.drain()
+        try:
+            if "log" in batch: append_lines(self.live_log, [msg for msg, in batch["log"]])
+            if "sys" in batch: append_lines(self.sys_log, [msg for msg, in batch["sys"]])
+            for values, in batch.get("threat", ()):
+                self.tree.insert("", "0", values=values) # Newest on top
+            for values, in batch.get("net", ()):
+                self.net_tree.insert("", "end", values=values)
+            for row, action in batch.get("action", ()):
+                if self.tree.exists(row): self.tree.set(row, "Action", action)
+            if "status" in batch:
+                text, fg = batch["status"][-1] # Only the latest status is visible anyway
+                self.lbl_status.config(text=text, fg=fg)
+        except tk.TclError: pass # Window closing
+        self.root.after(FRAME_MS, self._pump_ui)
+
+    def _wait_for_engine(self):
+        if not self.engine.ready:
+            self.root.after(100, self._wait_for_engine)
+            return
+        model = "MODEL_ONLINE" if self.engine.model is not None else "NO_MODEL"
+        self.log_terminal(f"ENGINE_READY: {model}")
+
+    def _report_metrics(self):
+        # Only when something was scanned since the last report
+        calls = sum(s["count"] for s in self.engine.stage_stats().values())
+        if calls != self._metrics_seen:
+            self._metrics_seen = calls
+            self.log_terminal(f"PERF: {self.engine.metrics.summary()}")
+            try: self.engine.metrics.dump(METRICS_DUMP)
+            except OSError: pass
+        self.root.after(METRICS_INTERVAL_MS, self._report_metrics)
 
     def _apply_styles(self):
         style = ttk.Style()
@@ -143,6 +204,7 @@ class AntivirusApp:
         frame.pack(fill="both", expand=True, padx=20, pady=20)
 
         self._make_btn(frame, ">> SCAN_RAM_MEMORY (PROCESSES)", self.scan_ram, bg="#002244", fg="cyan").pack(fill="x", pady=5)
+        self._make_btn(frame, ">> DEEP_SCAN_RAM (MAPPED REGIONS)", lambda: self.scan_ram(deep=True), bg="#002244", fg="cyan").pack(fill="x", pady=5)
         self._make_btn(frame, ">> SCAN_EXTERNAL_MEDIA (USB)", self.scan_usb, bg="#002244", fg="cyan").pack(fill="x", pady=5)
 
         self.sys_log = tk.Text(frame, bg="black", fg="cyan", font=("Consolas", 9), insertbackground="white")
@@ -164,12 +226,13 @@ class AntivirusApp:
 
     # --- LOGIC ---
     def log_terminal(self, msg):
-        try:
-            self.live_log.config(state="normal")
-            self.live_log.insert("end", f"> {msg}\n")
-            self.live_log.see("end")
-            self.live_log.config(state="disabled")
-        except: pass
+        self.bus.post("log", msg) # Safe from any thread
+
+    def set_status(self, text, fg):
+        self.bus.post("status", text, fg)
+
+    def add_threat(self, *values):
+        self.bus.post("threat", values)
 
     def custom_scan(self):
         path = filedialog.askdirectory()
@@ -186,68 +249,78 @@ class AntivirusApp:
 
     def stop_scan(self):
         self.scanning = False
+        if self.parallel: self.parallel.cancel()
         self.log_terminal("!!! ABORTING OPERATIONS !!!")
-        self.lbl_status.config(text="STATUS: ABORTED", fg="red")
+        self.set_status("STATUS: ABORTED", "red")
 
     def _scan_worker(self, target):
-        self.lbl_status.config(text="STATUS: SCANNING...", fg="orange")
+        self.set_status("STATUS: SCANNING...", "orange")
         self.log_terminal(f"INITIALIZING_SCAN: {target}")
         
-        count = 0 
-        for root, _, files in os.walk(target):
+        count = 0
+        self.parallel = ParallelScanner(metrics=self.engine.metrics, archives=SCAN_ARCHIVES)
+        rules = WalkRules(exclude=SCAN_EXCLUDE) # Huge files are deferred by the engine, not skipped
+        for p, status, conf, _ in self.parallel.scan(target, rules=rules):
             if not self.scanning: break
-            if "Windows" in root: continue
-            
-            for f in files:
+            f = os.path.basename(p)
+            count += 1
+
+            # VISUAL FEEDBACK: Show what we are scanning
+            if count % 5 == 0:
+                self.log_terminal(f"SCANNING: {f[:30]}...")
+
+            self._report_scan_result(p, status, conf)
+
+        # Files over the size ceiling were skipped above; sample them now that everything else is done
+        if self.scanning and self.parallel.deferred:
+            self.log_terminal(f"SCAN_COMPLETE. DEFERRED_JOBS: {len(self.parallel.deferred)} large file(s)")
+            for p, status, conf, _ in self.parallel.scan_deferred():
                 if not self.scanning: break
-                p = os.path.join(root, f)
-                
-                # VISUAL FEEDBACK: Show what we are scanning
-                if count % 5 == 0: 
-                    self.log_terminal(f"SCANNING: {f[:30]}...")
-                
-                try:
-                    status, conf, _ = self.engine.scan_file(p)
-                    count += 1
-                    
-                    if status == "UNSAFE":
-                        # --- THRESHOLD CHECK (Requested > 90%) ---
-                        try:
-                            score = float(conf.replace("%", ""))
-                            if score < 90.0:
-                                continue # Skip if risk is low (< 90)
-                        except: pass # If parse fails, treat as high risk (safe fallback)
-                        
-                        self.tree.insert("", "0", values=(p, "CRITICAL", conf, "PENDING")) # Insert at top
-                        self.log_terminal(f"!!! ANOMALY DETECTED (RISK {conf}): {f} !!!")
-                except: pass
-        
+                self.log_terminal(f"DEFERRED_SCANNED: {os.path.basename(p)[:30]} ({status})")
+                self._report_scan_result(p, status, conf)
+
         if self.scanning:
-            self.lbl_status.config(text="STATUS: PROTECTED", fg=THEME["fg"])
+            self.set_status("STATUS: PROTECTED", THEME["fg"])
             self.log_terminal("SCAN_COMPLETE.")
         else:
             self.log_terminal("OPERATIONS_HALTED_BY_USER.")
 
+    def _report_scan_result(self, p, status, conf):
+        if status == "SUSPICIOUS": # Generic signature (packer, script marker) the model didn't confirm: log only
+            self.log_terminal(f"SUSPICIOUS ({conf}): {os.path.basename(p)}")
+            return
+        if status != "UNSAFE":
+            return
+        # --- THRESHOLD CHECK (Requested > 90%) ---
+        try:
+            score = float(conf.split("%")[0])
+            if score < 90.0:
+                return # Skip if risk is low (< 90)
+        except: pass # If parse fails, treat as high risk (safe fallback)
+
+        self.add_threat(p, "CRITICAL", conf, "PENDING")
+        self.log_terminal(f"!!! ANOMALY DETECTED (RISK {conf}): {os.path.basename(p)} !!!")
+
     # --- KEEPING OTHER HANDLERS (USB/RAM) SIMILAR BUT WITH DARK THEME ---
     def log_sys(self, msg):
-        self.sys_log.insert("end", f"> {msg}\n"); self.sys_log.see("end")
+        self.bus.post("sys", msg)
 
-    def scan_ram(self):
-        threading.Thread(target=self._ram_worker, daemon=True).start()
-    def _ram_worker(self):
-        self.log_sys("READING_PROCESS_MEMORY...")
-        threats = self.sys_scanner.scan_memory(lambda m, c: self.log_sys(m) if c%10==0 else None)
+    def scan_ram(self, deep=False):
+        threading.Thread(target=self._ram_worker, args=(deep,), daemon=True).start()
+    def _ram_worker(self, deep=False):
+        self.log_sys("READING_PROCESS_MEMORY..." + (" (DEEP)" if deep else ""))
+        threats = self.sys_scanner.scan_memory(lambda m, c: self.log_sys(m) if c%10==0 else None, deep=deep)
         # Apply 90% filter to RAM too (manual filter here since system_scanner returns list)
         valid_threats = []
         if threats:
             for t in threats:
                 try:
-                    score = float(str(t['conf']).replace("%", ""))
+                    score = float(str(t["conf"]).split("%")[0])
                     if score >= 90.0: valid_threats.append(t)
                 except: valid_threats.append(t)
         
         if valid_threats:
-            for t in valid_threats: self.tree.insert("", "0", values=(f"MEM:{t['path']}", "HIGH", t['conf'], "KILL"))
+            for t in valid_threats: self.add_threat(f"MEM:{t['path']}", "HIGH", t['conf'], "KILL")
 
     def scan_usb(self):
         threading.Thread(target=self._usb_worker, daemon=True).start()
@@ -259,63 +332,75 @@ class AntivirusApp:
         if threats:
             for t in threats:
                 try:
-                    score = float(str(t['conf']).replace("%", ""))
+                    score = float(str(t["conf"]).split("%")[0])
                     if score >= 90.0: valid_threats.append(t)
                 except: valid_threats.append(t)
 
         if valid_threats:
-            for t in valid_threats: self.tree.insert("", "0", values=(t['path'], "HIGH", t['conf'], "QUARANTINE"))
+            for t in valid_threats: self.add_threat(t['path'], "HIGH", t['conf'], "QUARANTINE")
 
     def scan_network(self):
         self.net_tree.delete(*self.net_tree.get_children())
         threading.Thread(target=self._net_worker, daemon=True).start()
     def _net_worker(self):
-        devs = self.sys_scanner.scan_network_arp()
-        for d in devs: self.net_tree.insert("", "end", values=(d['ip'], d['hostname'], d['status']))
+        # Rows appear as each hostname resolves (slow/unresolvable hosts no longer hold up the rest)
+        def add(d): self.bus.post("net", (d['ip'], d['hostname'], d['status']))
+        devs = self.sys_scanner.scan_network_arp(callback=add)
+        if devs and devs[0]['status'] == "Failed": add(devs[0])
 
     def toggle_monitor(self):
         if self.monitoring:
             self.monitoring = False
+            if self.sentinel: self.sentinel.stop()
             self.btn_monitor.config(text=">> START_SENTINEL", fg="green")
         else:
             self.monitoring = True
             self.btn_monitor.config(text=">> STOP_SENTINEL", fg="red")
-            threading.Thread(target=self._monitor_worker, daemon=True).start()
-
-    def _monitor_worker(self):
-        watch = [os.path.join(os.path.expanduser("~"), "Downloads")]
-        seen = set()
-        while self.monitoring:
-            current = set()
-            for d in watch:
-                if os.path.exists(d):
-                    for f in os.listdir(d): current.add(os.path.join(d, f))
-            new = current - seen
-            for f in new:
-                self.log_terminal(f"NEW_FILE_INTERCEPTED: {f}")
-                status, conf, _ = self.engine.scan_file(f)
-                if status == "UNSAFE":
-                    # --- THRESHOLD CHECK ---
-                    try:
-                        score = float(conf.replace("%", ""))
-                        if score < 90.0: continue
-                    except: pass
-                    
-                    self.tree.insert("", "0", values=(f, "CRITICAL", conf, "NEW_DROP"))
-                    self.log_terminal(f"!!! BLOCKED (RISK {conf}): {f} !!!")
-            seen = current
-            time.sleep(2)
+            self.sentinel = Sentinel(self.engine, SENTINEL_WATCH, self._on_sentinel_verdict)
+            self.sentinel.start()
+
+    def _on_sentinel_verdict(self, f, verdict):
+        status, conf, _ = verdict
+        self.log_terminal(f"NEW_FILE_INTERCEPTED: {f}")
+        if status == "UNSAFE":
+            # --- THRESHOLD CHECK ---
+            try:
+                score = float(conf.split("%")[0])
+                if score < 90.0: return
+            except: pass
+
+            self.add_threat(f, "CRITICAL", conf, "NEW_DROP")
+            self.log_terminal(f"!!! BLOCKED (RISK {conf}): {f} !!!")
 
     def quarantine_selected(self):
+        # One background batch for the whole selection (the vault hashes and compresses every payload)
+        items, rows = [], {}
         for i in self.tree.selection():
-            p = self.tree.item(i, "values")[0]
-            self.engine.quarantine_file(p)
-            self.tree.set(i, "Action", "CONTAINED")
+            p, _, conf, _ = self.tree.item(i, "values")
+            if p.startswith("MEM:"): continue # Process rows: nothing on disk to contain
+            self.tree.set(i, "Action", "QUEUED")
+            p = container_path(p) # Archive members: the whole archive is contained (once per archive)
+            if p not in rows:
+                items.append((p, "UNSAFE", conf))
+                rows[p] = []
+            rows[p].append(i)
+        rows = list(rows.values())
+        if items:
+            threading.Thread(target=self._quarantine_worker, args=(items, rows), daemon=True).start()
+
+    def _quarantine_worker(self, items, rows):
+        results = self.engine.quarantine_many(items)
+        for group, (p, ok, detail) in zip(rows, results):
+            for row in group:
+                self.bus.post("action", row, "CONTAINED" if ok else "FAILED")
+            if not ok: self.log_terminal(f"QUARANTINE_FAILED: {os.path.basename(p)} ({detail})")
+        contained = sum(ok for _, ok, _ in results)
+        self.log_terminal(f"QUARANTINE: {contained}/{len(results)} contained")
             
     def delete_selected(self):
         for i in self.tree.selection():
             p = self.tree.item(i, "values")[0]
-            self.engine.delete_file(p)
+            self.engine.delete_file(container_path(p))
             self.tree.delete(i)
 
 if __name__ == "__main__":
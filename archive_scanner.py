@@ -0,0 +1,327 @@
+import io
+import os
+import bz2
+import gzip
+import lzma
+import time
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from metrics import now_ns
+from scanner_engine import BATCH_SIZE, BATCH_DEADLINE
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+SEP = "!/"                          # Virtual member paths: archive.zip!/dir/file.exe (nested: a.zip!/b.tar!/c.exe)
+ARCHIVE_SUFFIXES = (".zip", ".jar", ".war", ".ear", ".apk", ".tar", ".tgz", ".tbz2", ".txz",
+                    ".gz", ".bz2", ".xz")
+CHUNK_SIZE = 1024 * 1024            # Members are decompressed and fed to the digest in 1 MB chunks
+
+# Zip-bomb guards. A hit limit is reported as "Skipped" with the reason (highly compressible logs and dumps
+# trip them too, so it is not a malware verdict): an over-ratio zip member is skipped, anything else stops the archive
+MAX_DEPTH = 3                       # Archives inside archives (deeper ones are scanned as plain blobs)
+MAX_MEMBERS = 10_000
+MAX_RATIO = 200                     # Unpacked bytes per archive byte (per zip member and for the whole archive)...
+RATIO_FLOOR = 16 * 1024 * 1024      # ...once more than this much has been unpacked
+MAX_TOTAL_BYTES = 4 * 1024 * 1024 * 1024
+
+# Members up to this size are unpacked into memory and digested on a thread pool (hashing, zlib and the
+# NumPy signature pass release the GIL); bigger or unsized members stream through on the calling thread
+MEMBER_BUFFER_BYTES = 16 * 1024 * 1024
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024  # Archives smaller than this are scanned inline
+MEMBER_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ArchiveLimit(Exception):
+    """ A zip-bomb guard tripped (too many members or too much expansion). """
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _Encrypted(Exception):
+    pass
+
+
+def archive_kind(head):
+    """ "zip", "gzip", "bz2", "xz", "tar" or None, from the first 512 bytes. """
+    if head[:4] in (b"PK\x03\x04", b"PK\x05\x06"): return "zip"
+    if head[:2] == b"\x1f\x8b": return "gzip"
+    if head[:3] == b"BZh": return "bz2"
+    if head[:6] == b"\xfd7zXZ\x00": return "xz"
+    if head[257:262] == b"ustar": return "tar"
+    return None
+
+
+def is_archive(path):
+    """ Cheap check for the scan loop: suffix first, then the magic bytes. """
+    if not os.fspath(path).lower().endswith(ARCHIVE_SUFFIXES):
+        return False
+    try:
+        with open(path, "rb") as f:
+            return archive_kind(f.read(512)) is not None
+    except OSError:
+        return False
+
+
+def container_path(path):
+    """ The file on disk behind a virtual member path (the path itself for plain files). """
+    return path.split(SEP, 1)[0]
+
+
+def _peek(f, n=512):
+    try:
+        return f.peek(n)[:n]
+    except (AttributeError, io.UnsupportedOperation):
+        return b""
+
+
+class _Budget:
+    """ Running totals for one top-level archive, shared by every nesting level. """
+    def __init__(self, packed, cancel=None):
+        self.packed = max(packed, 1)
+        self.cancel = cancel
+        self.members = 0
+        self.unpacked = 0
+        self.unpack_ns = 0
+
+    def member(self):
+        self.members += 1
+        if self.members > MAX_MEMBERS:
+            raise ArchiveLimit(f"more than {MAX_MEMBERS} members")
+
+    def expand(self, n):
+        self.unpacked += n
+        if self.unpacked > MAX_TOTAL_BYTES:
+            raise ArchiveLimit(f"unpacks to more than {MAX_TOTAL_BYTES / 2**30:.0f} GB")
+        if self.unpacked > RATIO_FLOOR and self.unpacked > self.packed * MAX_RATIO:
+            raise ArchiveLimit(f"unpacks to more than {MAX_RATIO}x its size")
+
+    def chunks(self, f, limit=None):
+        """ Decompressed chunks of a member stream, charged to the budget as they come out
+            (declared sizes are never trusted). Stops after limit bytes when given. """
+        left = limit
+        while left is None or left > 0:
+            if self.cancel is not None and self.cancel.is_set():
+                raise _Cancelled()
+            t = now_ns()
+            chunk = f.read(CHUNK_SIZE if left is None else min(CHUNK_SIZE, left))
+            self.unpack_ns += now_ns() - t
+            if not chunk: return
+            self.expand(len(chunk))
+            if left is not None: left -= len(chunk)
+            yield chunk
+
+
+def iter_members(f, name, budget, depth=0):
+    """ Streams the members of the archive open as f (a binary file object): yields (virtual_path, size, stream)
+        for every regular file, recursing into nested archives up to MAX_DEPTH. size is None when the format
+        doesn't record it. For a member that can't be read (encrypted, unsupported compression, corrupt nested
+        archive, over-ratio) stream is the exception saying why, and the walk goes on. Each stream must be
+        consumed before the next member is requested: tar and compressed streams are read strictly forward. """
+    if not hasattr(f, "peek"):
+        f = io.BufferedReader(f)
+    kind = archive_kind(_peek(f))
+    if kind == "zip":
+        with zipfile.ZipFile(f) as zf:
+            for info in zf.infolist():
+                if info.is_dir(): continue
+                budget.member()
+                vpath = f"{name}{SEP}{info.filename}"
+                if info.file_size > RATIO_FLOOR and info.file_size > MAX_RATIO * max(info.compress_size, 1):
+                    yield vpath, info.file_size, ArchiveLimit(f"unpacks to more than {MAX_RATIO}x its size")
+                    continue
+                if info.flag_bits & 0x1:
+                    yield vpath, info.file_size, _Encrypted("Encrypted")
+                    continue
+                try:
+                    member = zf.open(info)
+                except Exception as e: # Deflate64, zstd and other methods zipfile can't decode
+                    yield vpath, info.file_size, e
+                    continue
+                with member:
+                    yield from _member(member, vpath, info.file_size, budget, depth)
+    elif kind == "tar":
+        with tarfile.open(fileobj=f, mode="r|") as tf:
+            for ti in tf:
+                if not ti.isfile(): continue
+                budget.member()
+                yield from _member(tf.extractfile(ti), f"{name}{SEP}{ti.name}", ti.size, budget, depth)
+    elif kind in ("gzip", "bz2", "xz"):
+        opener = {"gzip": gzip.GzipFile, "bz2": bz2.BZ2File, "xz": lzma.LZMAFile}[kind]
+        with opener(fileobj=f) if kind == "gzip" else opener(f) as stream:
+            if archive_kind(_peek(stream)) == "tar":
+                # .tar.gz and friends: one container, the tar members are the interesting part
+                yield from iter_members(stream, name, budget, depth)
+                return
+            budget.member()
+            base = os.path.basename(name.rsplit(SEP, 1)[-1])
+            inner = os.path.splitext(base)[0] if "." in base else base + ".out"
+            yield from _member(stream, f"{name}{SEP}{inner}", None, budget, depth)
+
+
+def _member(stream, vpath, size, budget, depth):
+    kind = archive_kind(_peek(stream))
+    if kind is None or depth + 1 >= MAX_DEPTH:
+        yield vpath, size, stream
+    elif kind == "zip":
+        # The zip directory sits at the end: a nested zip has to be unpacked (bounded) to be opened
+        if size is not None and size > MEMBER_BUFFER_BYTES:
+            yield vpath, size, stream
+            return
+        try:
+            data = b"".join(budget.chunks(stream, MEMBER_BUFFER_BYTES + 1))
+        except (ArchiveLimit, _Cancelled):
+            raise
+        except Exception as e:
+            yield vpath, size, e
+            return
+        if len(data) > MEMBER_BUFFER_BYTES:
+            raise ArchiveLimit(f"{vpath}: nested zip larger than declared")
+        yield from _nested(io.BytesIO(data), vpath, size, budget, depth)
+    else:
+        yield from _nested(stream, vpath, size, budget, depth)
+
+
+def _nested(f, vpath, size, budget, depth):
+    """ A corrupt nested archive becomes one unreadable member of its parent instead of ending the walk. """
+    try:
+        yield from iter_members(f, vpath, budget, depth + 1)
+    except (ArchiveLimit, _Cancelled):
+        raise
+    except Exception as e:
+        yield vpath, size, e
+
+
+def _unreadable(e):
+    """ Verdict for a member (or archive) that was not scanned. """
+    if isinstance(e, ArchiveLimit):
+        return "Skipped", f"Archive limit: {e}", "gray"
+    if isinstance(e, _Encrypted):
+        return "Skipped", "Encrypted", "gray"
+    return "Error", f"{type(e).__name__}: {e}", "yellow"
+
+
+class ArchiveScanner:
+    """ Container-aware scanning for a ScannerEngine: every archive member goes through the same hash,
+        signature, feature and batched inference pipeline as a file on disk, without touching the disk.
+        Members of archives over PARALLEL_MIN_BYTES are digested on a thread pool while the archive is read. """
+    def __init__(self, engine, workers=MEMBER_WORKERS):
+        self.engine = engine
+        self.workers = max(1, workers)
+
+    def scan(self, path):
+        """ [(virtual_path, (status, confidence_str, color))] in archive order. """
+        return list(self.iter_scan(path))
+
+    def iter_scan(self, path, batch_size=None, deadline=None):
+        """ Yields (virtual_path, verdict) per member. Unreadable members get their own "Error" (or "Skipped")
+            verdict and the scan moves on; a limit that stops the whole archive, or an archive that can't be
+            read past some point, adds one row for the archive itself. Stops early once engine.cancel is set. """
+        engine = self.engine
+        engine.wait_ready()
+        batch_size = batch_size or BATCH_SIZE
+        deadline = BATCH_DEADLINE if deadline is None else deadline
+        name = os.fspath(path)
+        cancel = engine.cancel
+        budget = _Budget(os.path.getsize(name), cancel)
+        pool = ThreadPoolExecutor(self.workers) if budget.packed >= PARALLEL_MIN_BYTES and self.workers > 1 else None
+        in_flight = deque()
+        pending, started = [], 0.0 # (virtual_path, features, hint) waiting for the model
+
+        def settle(vpath, verdict, feats, hint):
+            nonlocal started
+            if verdict is not None:
+                return [(vpath, verdict)]
+            if feats is None:
+                return [(vpath, engine.finish_verdict(None, hint))]
+            if not pending:
+                started = time.monotonic()
+            pending.append((vpath, feats, hint))
+            if len(pending) >= batch_size or time.monotonic() - started >= deadline:
+                return self._flush(pending)
+            return []
+
+        try:
+            with open(name, "rb") as f:
+                for vpath, size, stream in iter_members(f, name, budget):
+                    if cancel is not None and cancel.is_set():
+                        raise _Cancelled()
+                    if isinstance(stream, Exception):
+                        yield vpath, _unreadable(stream)
+                        continue
+                    try:
+                        t = budget.unpack_ns
+                        if pool is not None and size is not None and size <= MEMBER_BUFFER_BYTES:
+                            data = b"".join(budget.chunks(stream, MEMBER_BUFFER_BYTES + 1))
+                            if len(data) > MEMBER_BUFFER_BYTES:
+                                raise ArchiveLimit(f"{vpath}: member unpacks past its declared size")
+                            engine.metrics.add("unpack", budget.unpack_ns - t, len(data))
+                            in_flight.append((vpath, pool.submit(self._digest_member, vpath, data)))
+                        else:
+                            # Streams straight into the digest: memory stays at one chunk whatever the member size
+                            digest = engine.new_digest()
+                            for chunk in budget.chunks(stream):
+                                digest.update(chunk)
+                            engine.metrics.add("unpack", budget.unpack_ns - t, digest.size)
+                            yield from settle(*self._finish_member(vpath, digest))
+                    except (ArchiveLimit, _Cancelled):
+                        raise
+                    except Exception as e: # Corrupt deflate stream, bad CRC, truncated member...
+                        yield vpath, _unreadable(e)
+                    while len(in_flight) > self.workers * 2 or (in_flight and in_flight[0][1].done()):
+                        yield from settle(*self._result(*in_flight.popleft()))
+                while in_flight:
+                    yield from settle(*self._result(*in_flight.popleft()))
+        except _Cancelled:
+            pending.clear()
+        except ArchiveLimit as e:
+            yield name, _unreadable(e)
+        except Exception as e: # The archive itself (or a forward-only stream) can't be read any further
+            yield name, ("Error", f"Archive: {e}", "yellow")
+        finally:
+            for _, fut in in_flight: fut.cancel()
+            if pool is not None: pool.shutdown(wait=True)
+        if pending:
+            yield from self._flush(pending)
+
+    @staticmethod
+    def _result(vpath, future):
+        try:
+            return future.result()
+        except Exception as e:
+            return vpath, _unreadable(e), None, None
+
+    def _digest_member(self, vpath, data):
+        digest = self.engine.digest_buffer(data)
+        return self._finish_member(vpath, digest)
+
+    def _finish_member(self, vpath, digest):
+        verdict, feats, hint = self.engine.triage(digest)
+        self.engine.metrics.add_many(digest.timings)
+        return vpath, verdict, feats, hint
+
+    def _flush(self, pending):
+        import numpy as np
+        try:
+            verdicts = self.engine.classify_batch(np.vstack([feats for _, feats, _ in pending]))
+        except Exception as e:
+            verdicts = [("Error", str(e), "yellow")] * len(pending)
+        out = [(vpath, self.engine.finish_verdict(verdict, hint)) for (vpath, _, hint), verdict in zip(pending, verdicts)]
+        pending.clear()
+        return out
+
+
+if __name__ == "__main__":
+    # python archive_scanner.py <archive> [...]
+    import sys
+    from scanner_engine import ScannerEngine
+    engine = ScannerEngine(cache_path=None)
+    scanner = ArchiveScanner(engine)
+    for path in sys.argv[1:]:
+        for vpath, (status, conf, _) in scanner.iter_scan(path):
+            print(f"{status:8} {conf:24} {vpath}")
+    engine.close()
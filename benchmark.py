@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import platform
+import tempfile
+import subprocess
+import hashlib
+import numpy as np
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BENCH_BYTES = 256 * 1024 * 1024   # Data hashed per measurement
+CHUNK = 1024 * 1024               # Same window as ScannerEngine streaming reads
+BASE = os.path.dirname(os.path.abspath(__file__))
+
+# Synthetic corpus at scale=1 (~150 MB): kind -> (file count, min size, max size)
+CORPUS = {
+    "text": (2000, 200, 4096),
+    "binary": (400, 4096, 256 * 1024),
+    "blob": (4, 8 * 1024 * 1024, 32 * 1024 * 1024),
+    "pe": (300, 16 * 1024, 256 * 1024),
+}
+MALWARE_KINDS = ("blob", "pe")    # Labels used for the training stage (arbitrary but fixed)
+
+
+def _throughput(fn, buf, total=BENCH_BYTES):
+    """ MB/s for fn(chunk) over `total` bytes of (cached) data. """
+    view = memoryview(buf)
+    start = time.perf_counter()
+    for _ in range(total // len(buf)):
+        for off in range(0, len(view), CHUNK):
+            fn(view[off:off + CHUNK])
+    return total / (time.perf_counter() - start) / 1e6
+
+
+# ----------------------------
+# HASHING: cost of each extra digest in the single pass
+# ----------------------------
+def bench_hashing():
+    buf = np.random.default_rng(0).integers(0, 256, 64 * 1024 * 1024, dtype=np.uint8).tobytes()
+
+    def stage(algos, counts=False):
+        hashers = [hashlib.new(a) for a in algos]
+        acc = np.zeros(256, dtype=np.int64)
+        def fn(chunk):
+            for h in hashers: h.update(chunk)
+            if counts: np.add(acc, np.bincount(np.frombuffer(chunk, dtype=np.uint8), minlength=256), out=acc)
+        return fn
+
+    rows = [
+        ("byte counts only", [], True),
+        ("+ md5", ["md5"], True),
+        ("+ sha1", ["md5", "sha1"], True),
+        ("+ sha256", ["md5", "sha1", "sha256"], True),
+    ]
+    print("--- HASHING (single pass, 1 MB chunks, data in memory) ---")
+    prev = None
+    for name, algos, counts in rows:
+        mbps = _throughput(stage(algos, counts), buf)
+        # Extra seconds per GB relative to the previous row = cost of the added digest
+        extra = "" if prev is None else f"  (+{1000 / mbps - 1000 / prev:.2f} s/GB)"
+        print(f"{name:<18} {mbps:8.1f} MB/s{extra}")
+        prev = mbps
+    for algo in ("md5", "sha1", "sha256"):
+        print(f"{algo + ' alone':<18} {_throughput(stage([algo]), buf):8.1f} MB/s")
+
+
+# ----------------------------
+# PE FEATURES: header-only fast path vs full pefile parse
+# ----------------------------
+def _pe_corpus(root, limit=500):
+    paths = []
+    for cur, _, files in os.walk(root):
+        for f in files:
+            p = os.path.join(cur, f)
+            try:
+                with open(p, "rb") as fh:
+                    if fh.read(2) == b"MZ": paths.append(p)
+            except OSError:
+                pass
+            if len(paths) >= limit: return paths
+    return paths
+
+
+def _synthetic_pes(count=300, seed=0):
+    """ In-memory PE32 images from _pe_file (the scan corpus's "pe" kind): every one parses. """
+    rng = np.random.default_rng(seed)
+    _, lo, hi = CORPUS["pe"]
+    templates = _pe_templates()
+    return [_pe_file(rng, int(rng.integers(lo, hi + 1)), templates) for _ in range(count)]
+
+
+def bench_pe(corpus=None):
+    import features
+    if corpus is None and os.path.isdir("C:\\Windows\\System32"):
+        corpus = "C:\\Windows\\System32"
+    if corpus is None:
+        # No system PEs here (dataset/ holds none that parse): time the synthetic PE32 corpus instead
+        blobs = _synthetic_pes()
+        corpus = "synthetic PE32 corpus"
+    else:
+        paths = _pe_corpus(corpus)
+        if not paths:
+            print(f"No PE files under {corpus}")
+            return
+        blobs = [open(p, "rb").read() for p in paths]
+    mb = sum(len(b) for b in blobs) / 1e6
+
+    print(f"--- PE FEATURES ({len(blobs)} files, {mb:.1f} MB from {corpus}) ---")
+    timings = {}
+    for name, fn in (("full pefile", features.extract_pe_features_full), ("fast path", features.extract_pe_features)):
+        start = time.perf_counter()
+        out = [fn(b) for b in blobs]
+        timings[name] = (time.perf_counter() - start, out)
+        print(f"{name:<12} {timings[name][0]:8.2f} s  {len(blobs) / timings[name][0]:8.1f} files/s")
+    (full_t, full), (fast_t, fast) = timings["full pefile"], timings["fast path"]
+    mismatches = sum(a != b for a, b in zip(full, fast))
+    print(f"speedup      {full_t / fast_t:8.1f}x   mismatches: {mismatches}")
+
+
+# ----------------------------
+# STARTUP: import cost, time-to-first-window, time-to-first-verdict (fresh interpreters)
+# ----------------------------
+_FIRST_WINDOW = """
+import time; t0 = time.perf_counter()
+import tkinter as tk
+import antivirus_app
+root = tk.Tk()
+app = antivirus_app.AntivirusApp(root)
+root.update()
+print(time.perf_counter() - t0)
+app.engine.wait_ready()
+print(time.perf_counter() - t0)
+if app.sentinel: app.sentinel.stop()
+root.destroy()
+"""
+
+_FIRST_VERDICT = """
+import sys, time; t0 = time.perf_counter()
+from scanner_engine import ScannerEngine
+engine = ScannerEngine(cache_path=None)
+engine.scan_file(sys.argv[1])
+print(time.perf_counter() - t0)
+"""
+
+
+def _run(args):
+    base = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run([sys.executable] + args, cwd=base, capture_output=True, text=True)
+
+
+def bench_startup(module="antivirus_app", top=10):
+    # 1. python -X importtime: cumulative cost of each top-level import
+    out = _run(["-X", "importtime", "-c", f"import {module}"])
+    rows, total = [], 0.0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2 # Each nesting level adds two spaces
+        if depth == 1:
+            rows.append((int(cumulative) / 1e3, name.strip()))
+        elif depth == 0: # A top-level import closes; keep its children only if it is ours
+            if name.strip() == module:
+                total = int(cumulative) / 1e3
+                break
+            rows = []
+    print(f"--- STARTUP: import {module} ({total:.1f} ms) ---")
+    for ms, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {name:<26} {ms:8.1f} ms")
+
+    # 2. Window painted (engine still loading) and engine ready
+    out = _run(["-c", _FIRST_WINDOW])
+    if out.returncode == 0:
+        window, ready = (float(x) for x in out.stdout.split())
+        print(f"{'first window':<28} {window * 1e3:8.1f} ms")
+        print(f"{'engine ready':<28} {ready * 1e3:8.1f} ms")
+    else:
+        print(f"{'first window':<28}      n/a  (no display)")
+
+    # 3. Cold process -> first verdict (blocking engine, no cache)
+    dataset = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset")
+    sample = next((os.path.join(cur, f) for cur, _, files in os.walk(dataset) for f in files), __file__)
+    out = _run(["-c", _FIRST_VERDICT, sample])
+    if out.returncode == 0:
+        print(f"{'first verdict':<28} {float(out.stdout) * 1e3:8.1f} ms")
+    else:
+        print(f"{'first verdict':<28}      n/a  (child exited {out.returncode}):\n{out.stderr.strip()}")
+
+
+# ----------------------------
+# SYNTHETIC CORPUS (seeded: same seed + scale -> same bytes)
+# ----------------------------
+_WORDS = (b"the scanner file data system user import return function value error process network "
+          b"config update window string buffer stream module print install service").split()
+_PE_OPTIONAL = struct.Struct("<HBB9I6H4I2H6I")   # PE32 optional header without data directories
+_PE_SECTION = struct.Struct("<8s6I2HI")
+
+
+def _text_file(rng, size):
+    words = rng.choice(len(_WORDS), size // 5 + 1)
+    text = b" ".join(_WORDS[i] for i in words)
+    breaks = rng.integers(0, len(text), len(text) // 60)
+    buf = bytearray(text[:size])
+    for i in breaks[breaks < len(buf)]: buf[i] = 0x0A
+    return bytes(buf)
+
+
+def _binary_file(rng, size):
+    # Low-entropy structured data with random runs (anything from bitmaps to databases)
+    levels = rng.integers(2, 256)
+    data = rng.integers(0, levels, size, dtype=np.uint8)
+    runs = rng.integers(0, size, 8)
+    for r in runs: data[r:r + rng.integers(64, 4096)] = rng.integers(0, 256)
+    return data.tobytes()
+
+
+def _pe_file(rng, size, templates):
+    """ Minimal valid PE32 image (.text/.data/.rsrc) whose section bodies reuse bytes from dataset/ samples. """
+    n_sections, file_align, sect_align = 3, 0x200, 0x1000
+    body = max(size - 0x400, 3 * file_align) // n_sections // file_align * file_align
+    template = templates[rng.integers(len(templates))] if templates else b"\x90" * 64
+    text = (np.frombuffer(template, dtype=np.uint8)[rng.integers(0, len(template), body)]).tobytes()
+    data = _binary_file(rng, body)
+    rsrc = rng.integers(0, 256, body, dtype=np.uint8).tobytes() # Packed-looking resources
+
+    headers = bytearray(0x400)
+    headers[0:2] = b"MZ"
+    headers[0x3C:0x40] = struct.pack("<I", 0x40)
+    headers[0x40:0x44] = b"PE\0\0"
+    headers[0x44:0x58] = struct.pack("<HHIIIHH", 0x14C, n_sections, int(rng.integers(0, 2**31)), 0, 0, 0xE0, 0x0102)
+    span = (body + sect_align - 1) // sect_align * sect_align # Each section's virtual footprint
+    size_of_image = sect_align + n_sections * span
+    optional = _PE_OPTIONAL.pack(0x10B, 14, 0, body, 2 * body, 0, sect_align + int(rng.integers(0, body)), sect_align,
+                                 2 * sect_align, 0x400000, sect_align, file_align, 6, 0, 0, 0, 6, 0,
+                                 0, size_of_image, 0x400, 0, 2, 0, 0x100000, 0x1000, 0x100000, 0x1000, 0, 16)
+    headers[0x58:0x58 + 0xE0] = optional + bytes(16 * 8)
+    sections = [(b".text", text, 0x60000020), (b".data", data, 0xC0000040), (b".rsrc", rsrc, 0x40000040)]
+    for i, (name, raw, chars) in enumerate(sections):
+        off = 0x138 + i * _PE_SECTION.size
+        headers[off:off + _PE_SECTION.size] = _PE_SECTION.pack(name, len(raw), sect_align + i * span, len(raw),
+                                                               0x400 + i * body, 0, 0, 0, 0, chars)
+    return bytes(headers) + text + data + rsrc
+
+
+def _pe_templates():
+    """ The MZ files in dataset/ (byte sources for _pe_file section bodies). """
+    templates = []
+    for cur, _, files in os.walk(os.path.join(BASE, "dataset")):
+        for f in sorted(files):
+            with open(os.path.join(cur, f), "rb") as fh: data = fh.read()
+            if data[:2] == b"MZ": templates.append(data)
+    return templates
+
+
+def generate_corpus(root, seed=0, scale=1.0):
+    """ Writes root/<kind>/NNNNN.bin for each CORPUS kind. Returns {kind: [paths]}.
+        PE bodies sample bytes from the MZ files in dataset/ so they look like the training data. """
+    templates = _pe_templates()
+    makers = {"text": _text_file, "binary": _binary_file, "blob": None,
+              "pe": lambda rng, size: _pe_file(rng, size, templates)}
+    paths = {}
+    for k, (kind, (count, lo, hi)) in enumerate(CORPUS.items()):
+        rng = np.random.default_rng([seed, k]) # Independent stream per kind: scaling one doesn't shift the others
+        out = os.path.join(root, kind)
+        os.makedirs(out, exist_ok=True)
+        paths[kind] = []
+        for i in range(max(1, int(count * scale))):
+            size = int(rng.integers(lo, hi + 1))
+            data = rng.integers(0, 256, size, dtype=np.uint8).tobytes() if kind == "blob" else makers[kind](rng, size)
+            path = os.path.join(out, f"{i:05d}.bin")
+            with open(path, "wb") as f: f.write(data)
+            paths[kind].append(path)
+    return paths
+
+
+# ----------------------------
+# SCAN SUITE: files/s, MB/s, per-file latency, process peak RSS -> JSON
+# ----------------------------
+def peak_rss_mb():
+    """ Peak resident set size of this process so far (MB). Cumulative: a stage's value includes every earlier
+        stage, and pool worker processes are not counted. """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024 # macOS reports bytes, Linux KB
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+
+
+def _stage(files, nbytes, seconds, latencies=None):
+    row = {"files": files, "mb": round(nbytes / 1e6, 2), "seconds": round(seconds, 4),
+           "files_per_s": round(files / seconds, 1) if seconds else None,
+           "mb_per_s": round(nbytes / 1e6 / seconds, 1) if seconds else None}
+    if latencies:
+        p50, p99 = np.percentile(np.array(latencies) * 1e3, [50, 99])
+        row.update(p50_ms=round(float(p50), 3), p99_ms=round(float(p99), 3))
+    row["process_peak_rss_mb"] = round(peak_rss_mb(), 1) # Whole run so far, this process only
+    return row
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(corpus, paths, workers=None):
+    """ Times each scan path over a generated corpus. Returns {stage: metrics}. """
+    from scanner_engine import ScannerEngine
+    from parallel_scanner import ParallelScanner, walk_files
+    all_paths = [p for kind in paths.values() for p in kind]
+    nbytes = sum(os.path.getsize(p) for p in all_paths)
+    results = {}
+
+    # 1. scan_file one at a time (no verdict cache: every file does the full work)
+    engine = ScannerEngine(cache_path=None)
+    latencies = []
+    start = time.perf_counter()
+    for p in all_paths:
+        t = time.perf_counter()
+        engine.scan_file(p)
+        latencies.append(time.perf_counter() - t)
+    results["scan_file"] = _stage(len(all_paths), nbytes, time.perf_counter() - start, latencies)
+
+    # 2. Batched inference
+    start = time.perf_counter()
+    engine.scan_many(all_paths)
+    results["scan_many"] = _stage(len(all_paths), nbytes, time.perf_counter() - start)
+    engine.close()
+
+    # 3. Directory walk alone, then the process-pool scan of the same tree
+    start = time.perf_counter()
+    n = sum(1 for _ in walk_files(corpus))
+    results["walk"] = _stage(n, 0, time.perf_counter() - start)
+    start = time.perf_counter()
+    # No verdict cache here either: a shared cache would time cache hits and fill the user's scan_cache.db
+    n = sum(1 for _ in ParallelScanner(workers=workers, cache_path=None).scan(corpus))
+    results["parallel_scan"] = _stage(n, nbytes, time.perf_counter() - start)
+
+    # 4. Training: feature extraction into a fresh store, then the forest fit
+    from sklearn.ensemble import RandomForestClassifier
+    from feature_store import FeatureStore, load_dataset
+    samples = [(p, int(kind in MALWARE_KINDS)) for kind, ps in paths.items() for p in ps]
+    store_dir = tempfile.mkdtemp()
+    try:
+        store = FeatureStore(store_dir)
+        start = time.perf_counter()
+        X, y = load_dataset(samples, store, workers=workers)
+        results["train_features"] = _stage(len(X), nbytes, time.perf_counter() - start)
+        store.close()
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    start = time.perf_counter()
+    RandomForestClassifier(n_estimators=100, random_state=42).fit(X, y)
+    results["train_fit"] = _stage(len(X), 0, time.perf_counter() - start)
+    return results
+
+
+def bench_scan(out="bench_results.json", scale="1.0", seed="0", corpus=None):
+    """ Generates the corpus (into a temp dir unless `corpus` is given), runs the suite, writes JSON. """
+    scale, seed = float(scale), int(seed)
+    root = corpus or tempfile.mkdtemp(prefix="av_corpus_")
+    try:
+        start = time.perf_counter()
+        paths = generate_corpus(root, seed, scale)
+        sizes = {kind: sum(os.path.getsize(p) for p in ps) for kind, ps in paths.items()}
+        print(f"--- SCAN SUITE (seed {seed}, scale {scale}: {sum(map(len, paths.values()))} files, "
+              f"{sum(sizes.values()) / 1e6:.0f} MB, generated in {time.perf_counter() - start:.1f}s) ---")
+        results = run_suite(root, paths)
+    finally:
+        if corpus is None: shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "meta": {"seed": seed, "scale": scale, "commit": _git_commit(), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "timestamp": int(time.time()),
+                 "corpus": {kind: {"files": len(paths[kind]), "bytes": sizes[kind]} for kind in paths}},
+        "results": results,
+    }
+    for stage, r in results.items():
+        lat = f"  p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms" if "p50_ms" in r else ""
+        mbps = f"{r['mb_per_s']:8.1f} MB/s" if r["mb"] else " " * 13
+        print(f"{stage:<16} {r['files_per_s']:9.1f} files/s {mbps}{lat}  (process peak RSS so far {r['process_peak_rss_mb']:.0f} MB)")
+    if out:
+        with open(out, "w") as f: json.dump(report, f, indent=2)
+        print(f"[+] Results written to: {out}")
+    return report
+
+
+# Higher is better for throughput, lower for everything else
+_HIGHER_IS_BETTER = ("files_per_s", "mb_per_s")
+_COMPARED = ("files_per_s", "mb_per_s", "p50_ms", "p99_ms", "process_peak_rss_mb")
+
+
+def bench_compare(baseline, current, tolerance="0.10"):
+    """ Flags metrics in `current` that are worse than `baseline` by more than tolerance (10%). Exits 1 on regressions. """
+    tolerance = float(tolerance)
+    with open(baseline) as f: old = json.load(f)["results"]
+    with open(current) as f: new = json.load(f)["results"]
+    regressions = []
+    for stage in old.keys() & new.keys():
+        for metric in _COMPARED:
+            a, b = old[stage].get(metric), new[stage].get(metric)
+            if not a or b is None: continue
+            change = (b - a) / a
+            worse = -change if metric in _HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append((stage, metric, a, b, change))
+    for stage, metric, a, b, change in sorted(regressions):
+        print(f"REGRESSION {stage}.{metric}: {a} -> {b} ({change:+.1%})")
+    print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}")
+    if regressions: sys.exit(1)
+    return regressions
+
+
+BENCHES = {
+    "hashing": bench_hashing,
+    "pe": bench_pe,
+    "startup": bench_startup,
+    "scan": bench_scan,
+}
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [name [args...]]   (default: all)
+    #        python benchmark.py scan [out.json [scale [seed]]]
+    #        python benchmark.py compare baseline.json current.json [tolerance]
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        bench_compare(*sys.argv[2:])
+    elif len(sys.argv) > 1:
+        BENCHES[sys.argv[1]](*sys.argv[2:])
+    else:
+        for bench in BENCHES.values(): bench()
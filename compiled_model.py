@@ -0,0 +1,114 @@
+import os
+import numpy as np
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BASE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE, "scanner_model.pkl")
+COMPILED_PATH = os.path.join(BASE, "scanner_model.npz")
+
+
+def compiled_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+# ----------------------------
+# EXPORT (needs scikit-learn)
+# ----------------------------
+def export_forest(clf, path, source_md5=""):
+    """ Flattens a fitted RandomForestClassifier into contiguous arrays (all trees concatenated). """
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for est in clf.estimators_:
+        t = est.tree_
+        roots.append(offset)
+        is_leaf = t.children_left < 0
+        feature.append(np.where(is_leaf, -1, t.feature))
+        threshold.append(t.threshold)
+        # Children become global node ids; leaves point at themselves so traversal just stays put
+        ids = np.arange(t.node_count) + offset
+        left.append(np.where(is_leaf, ids, t.children_left + offset))
+        right.append(np.where(is_leaf, ids, t.children_right + offset))
+
+        v = t.value[:, 0, :clf.n_classes_].astype(np.float64)
+        sums = v.sum(axis=1)
+        if not np.allclose(sums, 1.0):
+            # Older scikit-learn stores class counts and normalises in predict_proba
+            sums[sums == 0.0] = 1.0
+            v = v / sums[:, None]
+        value.append(v)
+        offset += t.node_count
+
+    np.savez(
+        path,
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        value=np.concatenate(value),
+        roots=np.array(roots, dtype=np.int32),
+        depth=np.int32(max(est.tree_.max_depth for est in clf.estimators_)),
+        classes=np.asarray(clf.classes_),
+        n_features=np.int32(clf.n_features_in_),
+        source_md5=np.array(source_md5),
+    )
+    return path
+
+
+# ----------------------------
+# EVALUATOR (NumPy only)
+# ----------------------------
+class CompiledForest:
+    """ Batch evaluator for an exported forest. predict_proba matches scikit-learn bit for bit:
+        inputs are compared as float32 (like sklearn's tree code) and per-tree probabilities are
+        accumulated in estimator order before dividing by the tree count. """
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as z:
+            self.feature = z["feature"]
+            self.threshold = z["threshold"]
+            self.left = z["left"]
+            self.right = z["right"]
+            self.value = z["value"]
+            self.roots = z["roots"]
+            self.depth = int(z["depth"])
+            self.classes_ = z["classes"]
+            self.n_features_in_ = int(z["n_features"])
+            self.source_md5 = str(z["source_md5"])
+        self.n_estimators = len(self.roots)
+        # Leaf feature -1 would index the last column; any valid column works since leaves ignore it
+        self._gather_feature = np.where(self.feature < 0, 0, self.feature)
+
+    def apply(self, X):
+        """ Leaf node ids, shape (N, n_trees). All trees advance one level per step. """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_estimators)).copy()
+        for _ in range(self.depth):
+            go_left = X[rows, self._gather_feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((len(leaves), self.value.shape[1]), dtype=np.float64)
+        for t in range(self.n_estimators): # Same summation order as sklearn's accumulation
+            proba += self.value[leaves[:, t]]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compile_model(model_path=MODEL_PATH, out_path=None):
+    """ scanner_model.pkl -> scanner_model.npz (tagged with the pickle's MD5 so stale exports are ignored). """
+    import joblib
+    from scan_cache import model_fingerprint
+    return export_forest(joblib.load(model_path), out_path or compiled_path_for(model_path),
+                         source_md5=model_fingerprint(model_path))
+
+
+if __name__ == "__main__":
+    print(f"[*] Compiling {MODEL_PATH}...")
+    print(f"[+] Flat forest written to: {compile_model()}")
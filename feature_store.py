@@ -0,0 +1,245 @@
+import os
+import time
+import sqlite3
+import hashlib
+import multiprocessing as mp
+import numpy as np
+from features import N_FEATURES, FEATURE_VERSION, extract_features
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BASE = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE, "feature_store")
+DEFAULT_WORKERS = os.cpu_count() or 1
+POOL_THRESHOLD = 64        # Fewer new samples than this are extracted in-process (pool startup isn't worth it)
+TASK_CHUNK = 16            # Paths per worker round-trip
+ADD_EVERY = 4096           # Extracted rows buffered before they are appended to the store
+CHUNK_ROWS = 50_000        # Rows per chunk for out-of-core training (iter_chunks)
+
+# features_v<N>.npy is a plain .npy whose header is padded to a fixed size, so rows can be appended
+# in place and the header rewritten without moving the data
+HEADER_BYTES = 128
+DTYPE = np.dtype("<f8")
+ROW_BYTES = N_FEATURES * DTYPE.itemsize
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rows (
+    version INTEGER NOT NULL,
+    sha256  TEXT NOT NULL,
+    row     INTEGER NOT NULL,
+    PRIMARY KEY (version, sha256)
+);
+"""
+
+
+# ----------------------------
+# SAMPLE LISTING
+# ----------------------------
+def list_samples(directory, label, extensions=None, limit=None):
+    """ [(path, label)] for the regular files directly inside directory, in name order.
+        extensions filters by suffix, limit caps the count. """
+    samples = []
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return samples
+    for f in names:
+        if limit is not None and len(samples) >= limit: break
+        if extensions and not f.lower().endswith(tuple(extensions)): continue
+        path = os.path.join(directory, f)
+        if os.path.isfile(path):
+            samples.append((path, label))
+    return samples
+
+
+def _extract(path):
+    """ Worker: one read per sample -> (path, size, mtime_ns, sha256, features) or None if unreadable. """
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        return path, st.st_size, st.st_mtime_ns, hashlib.sha256(data).hexdigest(), extract_features(data)
+    except Exception:
+        return None
+
+
+# ----------------------------
+# STORE
+# ----------------------------
+class FeatureStore:
+    """ Feature rows keyed by (SHA-256, FEATURE_VERSION) in a memory-mapped .npy, with a SQLite sidecar
+        that maps digests to row numbers and remembers each path's (size, mtime) -> digest. """
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.npy_path = os.path.join(path, f"features_v{FEATURE_VERSION}.npy")
+        self.extracted = 0 # Rows added by this instance
+        self._db = sqlite3.connect(os.path.join(path, "index.db"), timeout=30)
+        self._db.executescript(_SCHEMA)
+        # Rows from another feature version are unusable: forget them and their matrix
+        self._db.execute("DELETE FROM rows WHERE version != ?", (FEATURE_VERSION,))
+        self._db.commit()
+        for f in os.listdir(path):
+            if f.startswith("features_v") and f.endswith(".npy") and os.path.join(path, f) != self.npy_path:
+                os.remove(os.path.join(path, f))
+        if not os.path.exists(self.npy_path):
+            with open(self.npy_path, "wb") as f:
+                self._write_header(f, 0)
+
+    @staticmethod
+    def _write_header(f, n_rows):
+        header = repr({"descr": DTYPE.str, "fortran_order": False, "shape": (n_rows, N_FEATURES)})
+        prefix = b"\x93NUMPY\x01\x00" + (HEADER_BYTES - 10).to_bytes(2, "little")
+        f.seek(0)
+        f.write(prefix + header.ljust(HEADER_BYTES - 11).encode("latin1") + b"\n")
+
+    def __len__(self):
+        with open(self.npy_path, "rb") as f:
+            np.lib.format.read_magic(f)
+            return np.lib.format.read_array_header_1_0(f)[0][0]
+
+    def matrix(self):
+        """ Read-only memory map of every stored row, shape (len(self), 27). """
+        return np.load(self.npy_path, mmap_mode="r") if len(self) else np.zeros((0, N_FEATURES))
+
+    def digest_for(self, path, st):
+        """ SHA-256 remembered for this path if the file is unchanged since it was extracted. """
+        row = self._db.execute("SELECT sha256 FROM files WHERE path=? AND size=? AND mtime_ns=?",
+                               (path, st.st_size, st.st_mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def rows_for(self, digests):
+        """ {sha256: row} for the digests that are already stored. """
+        found = {}
+        digests = list(digests)
+        for i in range(0, len(digests), 500): # SQLite parameter limit
+            part = digests[i:i + 500]
+            found.update(self._db.execute(
+                f"SELECT sha256, row FROM rows WHERE version=? AND sha256 IN ({','.join('?' * len(part))})",
+                [FEATURE_VERSION] + part).fetchall())
+        return found
+
+    def add(self, results):
+        """ Appends [(path, size, mtime_ns, sha256, features)] and returns {sha256: row}. Digests already
+            stored (duplicate content) are not appended twice. """
+        results = list(results)
+        rows = self.rows_for(r[3] for r in results)
+        new = {}
+        for _, _, _, sha, feats in results:
+            if sha not in rows and sha not in new:
+                new[sha] = feats
+        if new:
+            with open(self.npy_path, "r+b") as f:
+                start = len(self)
+                # Append after the last committed row (anything past it is a torn write) then publish the count
+                f.seek(HEADER_BYTES + start * ROW_BYTES)
+                f.write(np.asarray(list(new.values()), dtype=DTYPE).reshape(-1, N_FEATURES).tobytes())
+                f.truncate()
+                self._write_header(f, start + len(new))
+            for i, sha in enumerate(new):
+                rows[sha] = start + i
+            self._db.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                                 [(FEATURE_VERSION, sha, rows[sha]) for sha in new])
+            self.extracted += len(new)
+        self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                             [(p, size, mtime, sha) for p, size, mtime, sha, _ in results])
+        self._db.commit()
+        return rows
+
+    def close(self):
+        self._db.close()
+
+
+# ----------------------------
+# PIPELINE
+# ----------------------------
+def index_dataset(samples, store, workers=None):
+    """ Makes sure every sample has a stored feature row. Returns (rows, labels) as arrays in sample order.
+        New or modified files are extracted across a process pool; unreadable files are skipped. """
+    start = time.perf_counter()
+    known, todo = {}, []
+    for path, _ in samples:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        sha = store.digest_for(path, st)
+        if sha: known[path] = sha
+        else: todo.append(path)
+    # A remembered digest only helps if its row is still there (feature version may have changed)
+    rows = store.rows_for(set(known.values()))
+    for path in [p for p, sha in known.items() if sha not in rows]:
+        del known[path]
+        todo.append(path)
+
+    # Results are written to the store as they arrive, so memory does not grow with the corpus
+    extracted, batch = 0, []
+    def drain():
+        rows.update(store.add(batch))
+        known.update((r[0], r[3]) for r in batch)
+        batch.clear()
+
+    workers = max(1, workers or DEFAULT_WORKERS)
+    pool = mp.Pool(workers) if len(todo) >= POOL_THRESHOLD and workers > 1 else None
+    try:
+        for r in (pool.imap_unordered(_extract, todo, chunksize=TASK_CHUNK) if pool else map(_extract, todo)):
+            if r is None: continue
+            batch.append(r)
+            extracted += 1
+            if len(batch) >= ADD_EVERY: drain()
+        drain()
+    except BaseException:
+        if pool: pool.terminate() # Don't wait for the queued extractions
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    keep = [(rows[known[p]], label) for p, label in samples if p in known]
+    print(f"[*] Features: {len(keep) - extracted} from store, {extracted} extracted "
+          f"({time.perf_counter() - start:.1f}s)")
+    return (np.array([r for r, _ in keep], dtype=np.int64),
+            np.array([label for _, label in keep], dtype=np.int64))
+
+
+def load_dataset(samples, store=None, workers=None):
+    """ [(path, label)] -> (X (N, 27), y (N,)) in sample order, fully in memory. """
+    own_store = store is None
+    store = store if store is not None else FeatureStore()
+    try:
+        rows, y = index_dataset(samples, store, workers)
+        X = np.array(store.matrix()[rows], dtype=np.float64) if len(rows) else np.zeros((0, N_FEATURES))
+        return X, y
+    finally:
+        if own_store: store.close()
+
+
+def iter_chunks(store, rows, labels, chunk_rows=CHUNK_ROWS, seed=0):
+    """ Yields (X, y) chunks of at most chunk_rows in a seeded random order, read from the memory-mapped
+        matrix; only one chunk is in memory at a time. Shuffling keeps each chunk's class mix close to the corpus'. """
+    matrix = store.matrix()
+    order = np.random.default_rng(seed).permutation(len(rows))
+    for i in range(0, len(order), chunk_rows):
+        part = order[i:i + chunk_rows]
+        part = part[np.argsort(rows[part], kind="stable")] # Ascending rows read the mapping front to back
+        yield np.array(matrix[rows[part]], dtype=np.float64), labels[part]
+
+
+def dataset_samples(base=BASE):
+    """ The labelled dataset/ folders: benign = 0, malware = 1. """
+    return (list_samples(os.path.join(base, "dataset", "benign"), 0)
+            + list_samples(os.path.join(base, "dataset", "malware"), 1))
+
+
+if __name__ == "__main__":
+    # Pre-warm the store for dataset/ (trainers then only extract what changed)
+    X, y = load_dataset(dataset_samples())
+    print(f"[+] {len(X)} samples ({int(y.sum())} malware) in {STORE_DIR}")
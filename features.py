@@ -0,0 +1,219 @@
+import math
+import mmap
+import struct
+import numpy as np
+import pefile
+
+# ----------------------------
+# FEATURE LAYOUT (shared by training and scanning)
+# ----------------------------
+# 0-15  Byte histogram (16 bins, density-normalised)
+# 16    Entropy (bits/byte)
+# 17    Printable ratio (bytes 32..126)
+# 18    log1p(size)
+# 19-26 PE header features (zeros for non-PE)
+N_BASE = 19
+N_PE = 8
+N_FEATURES = N_BASE + N_PE
+FEATURE_VERSION = 1   # Bump whenever a feature's definition changes (invalidates the training feature store)
+
+
+def byte_counts(data):
+    """ The only pass over the bytes: 256-bin counts. Everything else is derived from these. """
+    return np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+
+
+def base_features(counts, sizes):
+    """ (N, 256) byte counts + (N,) sizes -> (N, 19) base features. Empty inputs give zero rows. """
+    counts = np.atleast_2d(counts)
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1)
+    denom = np.where(sizes > 0, sizes, 1.0)[:, None]
+
+    # 1. Byte Histogram (16 bins, same math as np.histogram(density=True))
+    hist = counts.reshape(-1, 16, 16).sum(axis=2) / 16.0 / denom
+    # 2. Entropy
+    probs = counts / denom
+    # Per row over the nonzero bins only: the same summation order as training, so the values match bit for bit
+    entropy = np.array([-np.sum(p[p > 0] * np.log2(p[p > 0])) for p in probs])
+    # 3. Structure
+    printable = counts[:, 32:127].sum(axis=1) / denom[:, 0]
+    log_size = np.log1p(sizes)
+
+    return np.column_stack([hist, entropy + 0.0, printable, log_size]) # + 0.0 folds -0.0 to 0.0
+
+
+def extract_pe_features_full(data):
+    """ Extract 8 solid features from PE Header (reference path: full pefile parse) """
+    try:
+        pe = pefile.PE(data=data)
+
+        # 1. Number of Sections (Malware often has weird counts)
+        num_sections = len(pe.sections)
+
+        # 2. Entropy of Text Section (Code)
+        text_entropy = 0.0
+        for section in pe.sections:
+            if b".text" in section.Name:
+                text_entropy = section.get_entropy()
+                break
+
+        # 3. Import Count
+        try: num_imports = len(pe.DIRECTORY_ENTRY_IMPORT)
+        except: num_imports = 0
+
+        # 4. Export Count
+        try: num_exports = len(pe.DIRECTORY_ENTRY_EXPORT.symbols)
+        except: num_exports = 0
+
+        # 5. Has Debug Info?
+        has_debug = 1 if hasattr(pe, 'DIRECTORY_ENTRY_DEBUG') else 0
+
+        # 6. Has Relocations?
+        has_reloc = 1 if hasattr(pe, 'DIRECTORY_ENTRY_BASERELOC') else 0
+
+        # 7. Has Resources?
+        has_rsrc = 1 if hasattr(pe, 'DIRECTORY_ENTRY_RESOURCE') else 0
+
+        # 8. Entry Point (Address)
+        entry_point = pe.OPTIONAL_HEADER.AddressOfEntryPoint
+
+        return [num_sections, text_entropy, num_imports, num_exports, has_debug, has_reloc, has_rsrc, entry_point]
+
+    except:
+        # Corrupt PE or parse error
+        return [0] * 8
+
+
+# ----------------------------
+# FAST PE PATH (headers + section table only)
+# ----------------------------
+_DIR_EXPORT = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_EXPORT"]
+_DIR_IMPORT = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_IMPORT"]
+_DIR_RESOURCE = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_RESOURCE"]
+_DIR_DEBUG = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_DEBUG"]
+_DIR_BASERELOC = pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_BASERELOC"]
+_BASE_RELOC = struct.Struct("<II")      # VirtualAddress, SizeOfBlock
+_RESOURCE_DIR = struct.Struct("<IIHHHH")
+
+
+def _read(pe, rva, size):
+    """ pe.get_data that returns None instead of raising or coming up short. """
+    try:
+        data = pe.get_data(rva, size)
+    except pefile.PEFormatError:
+        return None
+    return data if len(data) == size else None
+
+
+def section_entropy(data):
+    """ Same value as pefile's SectionStructure.entropy_H, bit for bit, but counted with one bincount.
+        pefile sums in first-seen byte order with math.log, so the 256 terms are ordered the same way. """
+    if not data: return 0.0
+    arr = np.frombuffer(data, dtype=np.uint8)
+    counts = byte_counts(arr)
+    remaining = set(np.flatnonzero(counts).tolist())
+    order, start, window = [], 0, 1 << 16
+    while remaining:
+        vals, first = np.unique(arr[start:start + window], return_index=True)
+        seen = sorted((i, v) for v, i in zip(vals.tolist(), first.tolist()) if v in remaining)
+        order += [v for _, v in seen]
+        remaining.difference_update(v for _, v in seen)
+        start += window
+        window *= 4
+    entropy = 0
+    n = len(data)
+    for v in order:
+        p_x = float(counts[v]) / n
+        entropy -= p_x * math.log(p_x, 2)
+    return entropy
+
+
+def _has_relocations(pe):
+    """ True when pefile would parse at least one IMAGE_BASE_RELOCATION block. """
+    dir_entry = pe.OPTIONAL_HEADER.DATA_DIRECTORY[_DIR_BASERELOC]
+    if not dir_entry.VirtualAddress or not dir_entry.Size: return 0
+    raw = _read(pe, dir_entry.VirtualAddress, _BASE_RELOC.size)
+    if raw is None: return 0
+    va, block = _BASE_RELOC.unpack(raw)
+    return int(va <= pe.OPTIONAL_HEADER.SizeOfImage and block <= pe.OPTIONAL_HEADER.SizeOfImage)
+
+
+def _has_resources(pe):
+    """ True when pefile would return a root resource directory (readable, <= 4096 entries). """
+    dir_entry = pe.OPTIONAL_HEADER.DATA_DIRECTORY[_DIR_RESOURCE]
+    if not dir_entry.VirtualAddress: return 0
+    raw = _read(pe, dir_entry.VirtualAddress, _RESOURCE_DIR.size)
+    if raw is None: return 0
+    named, ids = _RESOURCE_DIR.unpack(raw)[4:]
+    return int(named + ids <= 4096)
+
+
+def extract_pe_features(data):
+    """ Extract 8 solid features from PE Header.
+        Parses headers, the section table and the export/import/debug directories only; relocations and
+        resources are checked for presence rather than walked. Falls back to the full parse on surprises. """
+    try:
+        pe = pefile.PE(data=data, fast_load=True)
+    except Exception:
+        return [0] * 8 # Corrupt PE or parse error (the full parse would fail too)
+    try:
+        # 1. Number of Sections
+        num_sections = len(pe.sections)
+
+        # 2. Entropy of Text Section (Code)
+        text_entropy = 0.0
+        for section in pe.sections:
+            if b".text" in section.Name:
+                text_entropy = section_entropy(section.get_data())
+                break
+
+        # Only the directories we count. Imports stay with pefile: its thunk validation decides which
+        # descriptors count, and a descriptor-only walk disagrees on damaged import tables.
+        pe.parse_data_directories(directories=[_DIR_EXPORT, _DIR_IMPORT, _DIR_DEBUG])
+
+        # 3. Import Count
+        try: num_imports = len(pe.DIRECTORY_ENTRY_IMPORT)
+        except AttributeError: num_imports = 0
+
+        # 4. Export Count
+        try: num_exports = len(pe.DIRECTORY_ENTRY_EXPORT.symbols)
+        except AttributeError: num_exports = 0
+
+        # 5-7. Debug / Relocations / Resources present?
+        has_debug = 1 if hasattr(pe, 'DIRECTORY_ENTRY_DEBUG') else 0
+        has_reloc = _has_relocations(pe)
+        has_rsrc = _has_resources(pe)
+
+        # 8. Entry Point (Address)
+        entry_point = pe.OPTIONAL_HEADER.AddressOfEntryPoint
+
+        return [num_sections, text_entropy, num_imports, num_exports, has_debug, has_reloc, has_rsrc, entry_point]
+    except Exception:
+        return extract_pe_features_full(data)
+
+
+def pe_features(head):
+    """ PE features if the buffer starts with an MZ header. A mapping goes to pefile as-is, anything else as bytes. """
+    if bytes(head[:2]) != b'MZ':
+        return [0] * N_PE
+    return extract_pe_features(head if isinstance(head, mmap.mmap) else bytes(head))
+
+
+def features_from_counts(counts, size, head):
+    """ 27 features from precomputed byte counts and the (possibly truncated) head of the data. """
+    return np.concatenate([base_features(counts, [size])[0], pe_features(head)])
+
+
+def extract_features(data):
+    """ 27 features for one buffer -> shape (27,). """
+    if not data: return np.zeros(N_FEATURES)
+    return features_from_counts(byte_counts(data), len(data), data)
+
+
+def extract_features_batch(buffers):
+    """ 27 features for many buffers -> shape (N, 27). Base features are derived for all rows at once. """
+    if not buffers: return np.zeros((0, N_FEATURES))
+    counts = np.vstack([byte_counts(b) for b in buffers])
+    base = base_features(counts, [len(b) for b in buffers])
+    pe = np.array([pe_features(b) for b in buffers], dtype=np.float64)
+    return np.hstack([base, pe])
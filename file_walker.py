@@ -0,0 +1,106 @@
+import os
+import re
+import stat
+import fnmatch
+from collections import namedtuple
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+# Kernel pseudo-filesystems: endless or blocking "files", nothing on disk to scan
+PSEUDO_ROOTS = ("/proc", "/sys", "/dev", "/run")
+
+
+class FileRecord(namedtuple("FileRecord", "path st_dev st_ino st_size st_mtime_ns")):
+    """ A walked file plus the lstat fields the scanner needs. Pickles small for the worker queue, works
+        wherever a path does (os.fspath / open) and stands in for os.stat() in the verdict cache. """
+    __slots__ = ()
+
+    def __fspath__(self):
+        return self.path
+
+    def __str__(self):
+        return self.path
+
+
+def _compile(patterns):
+    """ Globs -> (regex over names, regex over full paths). A glob containing a separator matches the path. """
+    names, paths = [], []
+    for p in patterns or ():
+        (paths if "/" in p or os.sep in p else names).append(fnmatch.translate(os.path.normcase(p)))
+    as_regex = lambda parts: re.compile("|".join(parts)).match if parts else None
+    return as_regex(names), as_regex(paths)
+
+
+class WalkRules:
+    """ Pruning rules for walk(), compiled once.
+        include: file globs to keep (default: everything); exclude: file or directory globs to drop;
+        max_size: skip larger files (bytes); one_fs: don't cross into other mounts;
+        skip_dir(path): extra predicate for directories. """
+    def __init__(self, include=None, exclude=None, max_size=None, one_fs=True, skip_dir=None):
+        self.include = _compile(include)
+        self.exclude = _compile(exclude)
+        self.has_include = bool(include)
+        self.max_size = max_size
+        self.one_fs = one_fs
+        self.skip_dir = skip_dir
+
+    @staticmethod
+    def _match(rule, name, path):
+        by_name, by_path = rule
+        if not (by_name or by_path): return False
+        name, path = os.path.normcase(name), os.path.normcase(path)
+        return bool(by_name and by_name(name)) or bool(by_path and by_path(path))
+
+    def keep_dir(self, name, path):
+        if path in PSEUDO_ROOTS or self._match(self.exclude, name, path):
+            return False
+        return not (self.skip_dir and self.skip_dir(path))
+
+    def keep_file(self, name, path):
+        if self.has_include and not self._match(self.include, name, path):
+            return False
+        return not self._match(self.exclude, name, path)
+
+
+def walk(root, rules=None):
+    """ Yields a FileRecord for every regular file under root (or root itself if it is a file).
+        Built on os.scandir: file types come from the directory listing and each file is lstat'ed
+        exactly once, here; the scanner reuses that stat instead of taking its own.
+        Symlinks, FIFOs, sockets and devices are skipped; unreadable directories are passed over. """
+    rules = rules or WalkRules()
+    try:
+        st = os.stat(root)
+    except OSError:
+        return
+    if stat.S_ISREG(st.st_mode):
+        if rules.max_size is None or st.st_size <= rules.max_size:
+            yield FileRecord(os.fspath(root), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        return
+    if not stat.S_ISDIR(st.st_mode):
+        return
+    root_dev = st.st_dev
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue # Permission denied, vanished
+        subdirs = []
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not rules.keep_dir(entry.name, entry.path): continue
+                        # st_dev is 0 where the listing doesn't carry it (Windows): no boundary check there
+                        dev = entry.stat(follow_symlinks=False).st_dev if rules.one_fs else 0
+                        if dev and dev != root_dev: continue
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        if not rules.keep_file(entry.name, entry.path): continue
+                        st = entry.stat(follow_symlinks=False)
+                        if rules.max_size is not None and st.st_size > rules.max_size: continue
+                        yield FileRecord(entry.path, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue # Entry vanished between listing and stat
+        stack.extend(reversed(subdirs)) # Depth-first, in listing order
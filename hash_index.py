@@ -0,0 +1,171 @@
+import os
+import sys
+import mmap
+import pickle
+import struct
+import bisect
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BASE = os.path.dirname(os.path.abspath(__file__))
+MALWARE_CSV = os.path.join(BASE, "Malware dataset.csv")
+MALWARE_PKL = os.path.join(BASE, "malware_hashes.pkl")
+
+# Digest width (bytes) -> algorithm name used in index file names
+ALGORITHMS = {16: "md5", 20: "sha1", 32: "sha256"}
+
+BLOOM_BITS_PER_KEY = 10    # ~1% false positives with 7 probes
+BLOOM_PROBES = 7
+
+# File layout: header | bloom bits | sorted fixed-width digests
+MAGIC = b"AVHIDX1\0"
+HEADER = struct.Struct("<8sIIQQ")   # magic, width, probes, bloom_bits, count
+
+
+def index_path(algo, base=BASE):
+    return os.path.join(base, f"malware_{algo}.idx")
+
+
+def _probes(digest, m_bits, k):
+    # Digests are already uniform, so two 64-bit slices drive double hashing
+    h1 = int.from_bytes(digest[0:8], "little")
+    h2 = int.from_bytes(digest[8:16], "little") | 1
+    return [(h1 + i * h2) % m_bits for i in range(k)]
+
+
+# ----------------------------
+# LOOKUP
+# ----------------------------
+class _Records:
+    """ Sequence view over the sorted digest block so bisect can search the mapping directly. """
+    def __init__(self, mm, offset, width, count):
+        self.mm, self.offset, self.width, self.count = mm, offset, width, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * self.width
+        return self.mm[start:start + self.width]
+
+
+class HashIndex:
+    """ Memory-mapped signature index: bloom filter check, then binary search.
+        Supports `hex_or_raw_digest in index`. """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.probes, self.bloom_bits, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a hash index: {path}")
+        self._bloom_off = HEADER.size
+        self._records = _Records(self._mm, self._bloom_off + self.bloom_bits // 8, self.width, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, digest):
+        if isinstance(digest, str):
+            try:
+                digest = bytes.fromhex(digest)
+            except ValueError:
+                return False
+        if len(digest) != self.width or not self.count:
+            return False
+
+        # 1. Bloom filter (rejects almost every clean file without touching the records)
+        mm, off = self._mm, self._bloom_off
+        for bit in _probes(digest, self.bloom_bits, self.probes):
+            if not mm[off + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+
+        # 2. Binary search over the sorted digests
+        i = bisect.bisect_left(self._records, digest)
+        return i < self.count and self._records[i] == digest
+
+    def close(self):
+        self._mm.close()
+
+
+# ----------------------------
+# BUILD
+# ----------------------------
+def read_feed(path):
+    """ Yields hash strings from a CSV ("hash" column) or a pickled collection. """
+    if path.endswith(".pkl"):
+        with open(path, "rb") as f:
+            yield from (str(h) for h in pickle.load(f))
+    else:
+        import pandas as pd
+        for chunk in pd.read_csv(path, usecols=["hash"], dtype=str, chunksize=100_000):
+            yield from chunk["hash"].dropna()
+
+
+def write_index(path, digests, width):
+    digests = sorted(set(digests))
+    m_bits = max(64, len(digests) * BLOOM_BITS_PER_KEY)
+    m_bits = (m_bits + 63) // 64 * 64 # Whole bytes, 8-byte aligned records
+    bloom = bytearray(m_bits // 8)
+    for d in digests:
+        for bit in _probes(d, m_bits, BLOOM_PROBES):
+            bloom[bit >> 3] |= 1 << (bit & 7)
+
+    tmp = f"{path}.{os.getpid()}.tmp" # Per process: pool workers may build at the same time
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, BLOOM_PROBES, m_bits, len(digests)))
+        f.write(bloom)
+        for d in digests:
+            f.write(d)
+    os.replace(tmp, path) # Readers never see a half-written index
+    return len(digests)
+
+
+def build(sources, out_dir=BASE):
+    """ Compiles hash feeds into one index per digest width. Non-hex entries are skipped. """
+    buckets = {width: [] for width in ALGORITHMS}
+    for src in sources:
+        if not os.path.exists(src):
+            continue
+        for h in read_feed(src):
+            h = h.strip().lower()
+            try:
+                raw = bytes.fromhex(h)
+            except ValueError:
+                continue
+            if len(raw) in buckets:
+                buckets[len(raw)].append(raw)
+
+    counts = {}
+    for width, digests in buckets.items():
+        algo = ALGORITHMS[width]
+        counts[algo] = write_index(index_path(algo, out_dir), digests, width)
+    return counts
+
+
+def is_stale(sources, out_dir=BASE):
+    """ True if an index is missing or older than one of the feeds. """
+    newest = max((os.path.getmtime(s) for s in sources if os.path.exists(s)), default=0)
+    for algo in ALGORITHMS.values():
+        path = index_path(algo, out_dir)
+        if not os.path.exists(path) or os.path.getmtime(path) < newest:
+            return True
+    return False
+
+
+def ensure_index(sources=(MALWARE_CSV, MALWARE_PKL), out_dir=BASE):
+    """ Builds the indexes when missing (they are not committed, so a fresh clone has none) or stale.
+        Returns the build counts, or None if the indexes were up to date. """
+    if not is_stale(sources, out_dir):
+        return None
+    return build(sources, out_dir)
+
+
+if __name__ == "__main__":
+    # Usage: python hash_index.py [feed.csv|feed.pkl ...]
+    feeds = sys.argv[1:] or [MALWARE_CSV, MALWARE_PKL]
+    print(f"[*] Compiling hash feeds: {', '.join(os.path.basename(f) for f in feeds)}")
+    for algo, n in build(feeds).items():
+        print(f"[+] {algo}: {n} signatures -> {index_path(algo)}")
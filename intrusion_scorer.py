@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BASE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE, "model.pkl")
+SCALER_PATH = os.path.join(BASE, "scaler.pkl")
+DATA_PATH = os.path.join(BASE, "cybersecurity_intrusion_data.csv")
+
+CHUNK_ROWS = 65_536        # Rows per vectorized batch (and per CSV/Parquet read): memory is bounded by this
+STREAM_DEADLINE = 0.25     # stdin: score a partial batch after this many seconds
+THRESHOLD = 0.5            # attack probability at which a session is flagged
+
+ID_COLUMN = "session_id"
+LABEL_COLUMN = "attack_detected"
+NUMERIC = ("network_packet_size", "login_attempts", "session_duration",
+           "ip_reputation_score", "failed_logins", "unusual_time_access")
+# Vocabularies of the categorical columns, one-hot encoded in this order (anything else encodes as all zeros)
+CATEGORIES = {
+    "protocol_type": ("ICMP", "TCP", "UDP"),
+    "encryption_used": ("AES", "DES", "None"),
+    "browser_type": ("Chrome", "Edge", "Firefox", "Safari", "Unknown"),
+}
+FEATURES = list(NUMERIC) + [f"{col}={v}" for col, vocab in CATEGORIES.items() for v in vocab]
+N_FEATURES = len(FEATURES) # 17
+
+
+# ----------------------------
+# ENCODING
+# ----------------------------
+# Lookup tables: row i is the one-hot vector of vocabulary entry i; the extra last row (zeros) is for
+# unseen values, which get_indexer returns as -1
+_TABLES = {col: np.vstack([np.eye(len(vocab)), np.zeros((1, len(vocab)))]) for col, vocab in CATEGORIES.items()}
+_INDEXES = {col: pd.Index(vocab) for col, vocab in CATEGORIES.items()}
+_DTYPES = {col: str for col in CATEGORIES} | {ID_COLUMN: str}
+
+
+def encode(frame):
+    """ Session records (a DataFrame with the NUMERIC and CATEGORIES columns) -> (N, 17) float64 matrix.
+        Unparseable or missing numbers become NaN (the scorer imputes them with the scaler mean). """
+    X = np.empty((len(frame), N_FEATURES))
+    for j, col in enumerate(NUMERIC):
+        X[:, j] = pd.to_numeric(frame[col], errors="coerce") if col in frame else np.nan
+    j = len(NUMERIC)
+    for col, vocab in CATEGORIES.items():
+        # "None" is a category here, not a missing value (pandas would read it as NaN)
+        values = frame[col].fillna("None") if col in frame else pd.Series("None", index=frame.index)
+        codes = _INDEXES[col].get_indexer(values)
+        X[:, j:j + len(vocab)] = _TABLES[col][codes]
+        j += len(vocab)
+    return X
+
+
+def _ids(frame, start):
+    if ID_COLUMN in frame:
+        return frame[ID_COLUMN].to_numpy()
+    return np.arange(start, start + len(frame)).astype(str) # Row numbers when the log has no ids
+
+
+# ----------------------------
+# SCORER
+# ----------------------------
+def _load_checked(name, path):
+    import joblib
+    try:
+        obj = joblib.load(path)
+    except Exception as e: # e.g. pickled by a scikit-learn with different private modules
+        raise ValueError(f"{name} {os.path.basename(path)} can't be loaded ({type(e).__name__}: {e}): "
+                         f"retrain with `python intrusion_scorer.py train`") from e
+    if getattr(obj, "n_features_in_", N_FEATURES) != N_FEATURES:
+        raise ValueError(f"{name} expects {obj.n_features_in_} features, the session encoding has "
+                         f"{N_FEATURES}: retrain with `python intrusion_scorer.py train`")
+    return obj
+
+
+class IntrusionScorer:
+    """ Loads the scaler and model once and scores session records in vectorized batches.
+        Scaling is done with the scaler's mean_/scale_ arrays directly (one subtract/divide per batch). """
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, threshold=THRESHOLD):
+        # The scaler is checked before the model is unpickled: a mismatched pair fails with the retrain hint
+        scaler = _load_checked("scaler", scaler_path)
+        self.model = _load_checked("model", model_path)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(N_FEATURES)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(N_FEATURES)
+        self.attack_col = list(self.model.classes_).index(1)
+        self.threshold = threshold
+
+    def score_matrix(self, X):
+        """ (N, 17) encoded rows -> (N,) attack probabilities. X is scaled in place. """
+        np.subtract(X, self.mean, out=X)
+        np.divide(X, self.scale, out=X)
+        np.nan_to_num(X, copy=False, nan=0.0) # Missing values sit at the mean
+        return self.model.predict_proba(X)[:, self.attack_col]
+
+    def score(self, frame):
+        return self.score_matrix(encode(frame))
+
+    def score_file(self, path, chunk_rows=CHUNK_ROWS):
+        """ Yields (session_ids, probabilities) per chunk of a CSV or Parquet log; only one chunk is in memory. """
+        start = 0
+        for frame in read_chunks(path, chunk_rows):
+            yield _ids(frame, start), self.score(frame)
+            start += len(frame)
+
+    def score_lines(self, lines, chunk_rows=CHUNK_ROWS, deadline=STREAM_DEADLINE):
+        """ Yields (session_ids, probabilities) for line-delimited JSON records. A batch is scored once it
+            holds chunk_rows records or its first record is `deadline` seconds old, so a slow stream still
+            gets prompt verdicts. Blank or malformed lines are skipped. """
+        q = queue.Queue(maxsize=chunk_rows * 4)
+        done = object()
+        def reader():
+            try:
+                for line in lines: q.put(line)
+            finally:
+                q.put(done)
+        threading.Thread(target=reader, daemon=True).start()
+
+        batch, started, start = [], 0.0, 0
+        while True:
+            timeout = None if not batch else max(0.0, started + deadline - time.monotonic())
+            try:
+                line = q.get(timeout=timeout)
+            except queue.Empty:
+                line = None # Deadline: flush what we have
+            if line is done or line is None or len(batch) >= chunk_rows:
+                if batch:
+                    frame = pd.DataFrame.from_records(batch)
+                    yield _ids(frame, start), self.score(frame)
+                    start += len(batch)
+                    batch = []
+                if line is done: return
+                if line is None: continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                if not batch: started = time.monotonic()
+                batch.append(record)
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """ DataFrames of at most chunk_rows from a CSV (or .parquet, which needs pyarrow). """
+    columns = [ID_COLUMN, *NUMERIC, *CATEGORIES]
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet logs need pyarrow (pip install pyarrow)")
+        pf = pq.ParquetFile(path)
+        present = [c for c in columns if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=present):
+            yield batch.to_pandas()
+        return
+    # keep_default_na=False: "None" is an encryption category, not a missing value
+    yield from pd.read_csv(path, usecols=lambda c: c in columns, dtype=_DTYPES, keep_default_na=False,
+                           chunksize=chunk_rows)
+
+
+# ----------------------------
+# TRAIN
+# ----------------------------
+def train_intrusion(data_path=DATA_PATH, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """ Fits the scaler and a soft-voting gradient boosting + random forest on the labelled sessions
+        and writes both pickles. Returns (model, scaler, holdout accuracy). """
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier, VotingClassifier
+    from sklearn.model_selection import train_test_split
+
+    frame = pd.read_csv(data_path, dtype=_DTYPES, keep_default_na=False)
+    X, y = encode(frame), frame[LABEL_COLUMN].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    scaler = StandardScaler().fit(X_train)
+    model = VotingClassifier([
+        ("gb", GradientBoostingClassifier(n_estimators=100, max_depth=3, random_state=42)),
+        ("rf", RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42)),
+    ], voting="soft")
+    model.fit(scaler.transform(X_train), y_train)
+    accuracy = model.score(scaler.transform(X_test), y_test)
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+    return model, scaler, accuracy
+
+
+def _write(ids, proba, threshold, out, as_json):
+    attack = proba >= threshold
+    if as_json:
+        out.write("".join(json.dumps({"session_id": str(i), "score": round(float(p), 6), "attack": bool(a)}) + "\n"
+                          for i, p, a in zip(ids, proba, attack)))
+    else:
+        out.write("".join(f"{i},{p:.6f},{int(a)}\n" for i, p, a in zip(ids, proba, attack)))
+    out.flush()
+
+
+if __name__ == "__main__":
+    # python intrusion_scorer.py train | score <sessions.csv|.parquet> | stream   (stream: JSON lines on stdin)
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "score"
+    try:
+        scorer = None if cmd == "train" else IntrusionScorer()
+    except ValueError as e:
+        sys.exit(f"[-] {e}")
+    if cmd == "train":
+        _, _, acc = train_intrusion()
+        print(f"[+] Holdout accuracy: {acc * 100:.2f}%  ->  {MODEL_PATH}, {SCALER_PATH}")
+    elif cmd == "stream":
+        for ids, proba in scorer.score_lines(sys.stdin):
+            _write(ids, proba, scorer.threshold, sys.stdout, as_json=True)
+    else:
+        path = sys.argv[2] if len(sys.argv) > 2 else DATA_PATH
+        n, start = 0, time.perf_counter()
+        sys.stdout.write("session_id,score,attack\n")
+        for ids, proba in scorer.score_file(path):
+            _write(ids, proba, scorer.threshold, sys.stdout, as_json=False)
+            n += len(ids)
+        elapsed = time.perf_counter() - start
+        print(f"[*] {n} sessions in {elapsed:.2f}s ({n / elapsed:,.0f}/s)", file=sys.stderr)
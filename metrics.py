@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+# Hot-path stages recorded by ScannerEngine (in pipeline order)
+STAGES = ("open", "copy", "read", "unpack", "hash", "signatures", "base_features", "pe_features", "inference", "cache", "quarantine")
+N_BUCKETS = 32     # Bucket i holds durations in [2**(i-1), 2**i) microseconds; the last one is open-ended
+INSTRUMENT = os.environ.get("AV_METRICS", "1") != "0"
+
+now_ns = time.perf_counter_ns
+
+
+class Metrics:
+    """ Per-stage timing histograms plus call and byte counters. add() costs one lock and a few integer ops;
+        per-chunk stages are summed on the StreamDigest and recorded once per file with add_many().
+        Thread-safe; export()/merge() move data between processes. """
+    def __init__(self, enabled=INSTRUMENT):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {} # stage -> [count, total_ns, total_bytes, buckets]
+
+    def add(self, stage, ns, nbytes=0):
+        if not self.enabled: return
+        bucket = min((ns // 1000).bit_length(), N_BUCKETS - 1)
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = [0, 0, 0, [0] * N_BUCKETS]
+            s[0] += 1
+            s[1] += ns
+            s[2] += nbytes
+            s[3][bucket] += 1
+
+    def add_many(self, timings):
+        """ {stage: [ns, bytes]} for one file (StreamDigest.timings) under a single lock. """
+        if not self.enabled or not timings: return
+        with self._lock:
+            for stage, (ns, nbytes) in timings.items():
+                s = self._stages.get(stage)
+                if s is None:
+                    s = self._stages[stage] = [0, 0, 0, [0] * N_BUCKETS]
+                s[0] += 1
+                s[1] += ns
+                s[2] += nbytes
+                s[3][min((ns // 1000).bit_length(), N_BUCKETS - 1)] += 1
+
+    # --- transport (ParallelScanner workers -> parent) ---
+    def export(self):
+        with self._lock:
+            return {k: [c, ns, b, list(h)] for k, (c, ns, b, h) in self._stages.items()}
+
+    def merge(self, raw):
+        with self._lock:
+            for stage, (c, ns, b, h) in raw.items():
+                s = self._stages.setdefault(stage, [0, 0, 0, [0] * N_BUCKETS])
+                s[0] += c
+                s[1] += ns
+                s[2] += b
+                s[3] = [x + y for x, y in zip(s[3], h)]
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    # --- reporting ---
+    @staticmethod
+    def _quantile(buckets, count, q):
+        """ Upper bound (µs) of the bucket holding the q-quantile. """
+        seen = 0
+        for i, n in enumerate(buckets):
+            seen += n
+            if seen >= q * count:
+                return float(2 ** i)
+        return float(2 ** (N_BUCKETS - 1))
+
+    def snapshot(self):
+        """ {stage: {count, total_ms, mean_us, p50_us, p99_us, bytes, mb_per_s}} in STAGES order. """
+        raw = self.export()
+        out = {}
+        for stage in sorted(raw, key=lambda k: STAGES.index(k) if k in STAGES else len(STAGES)):
+            c, ns, b, h = raw[stage]
+            out[stage] = {
+                "count": c,
+                "total_ms": round(ns / 1e6, 3),
+                "mean_us": round(ns / c / 1e3, 2) if c else 0.0,
+                "p50_us": self._quantile(h, c, 0.50),
+                "p99_us": self._quantile(h, c, 0.99),
+                "bytes": b,
+                "mb_per_s": round(b / 1e6 / (ns / 1e9), 1) if b and ns else None,
+            }
+        return out
+
+    def summary(self):
+        """ One line for the live terminal: each stage's share of the recorded time. """
+        snap = self.snapshot()
+        total = sum(s["total_ms"] for s in snap.values())
+        if not total:
+            return "no samples"
+        return " | ".join(f"{k} {s['total_ms']:.0f}ms {100 * s['total_ms'] / total:.0f}%" for k, s in snap.items())
+
+    def prometheus(self, prefix="av_stage"):
+        """ Prometheus text exposition (histograms in seconds, bytes as a counter). """
+        stages = self.export()
+        # Each family's samples must be contiguous: every stage's histogram first, then the byte counters
+        lines = [f"# TYPE {prefix}_seconds histogram"]
+        for stage, (c, ns, b, h) in stages.items():
+            cum = 0
+            for i, n in enumerate(h[:-1]):
+                cum += n
+                lines.append(f'{prefix}_seconds_bucket{{stage="{stage}",le="{2 ** i / 1e6:g}"}} {cum}')
+            lines.append(f'{prefix}_seconds_bucket{{stage="{stage}",le="+Inf"}} {c}')
+            lines.append(f'{prefix}_seconds_sum{{stage="{stage}"}} {ns / 1e9:.9f}')
+            lines.append(f'{prefix}_seconds_count{{stage="{stage}"}} {c}')
+        lines.append(f"# TYPE {prefix}_bytes_total counter")
+        for stage, (_, _, b, _) in stages.items():
+            lines.append(f'{prefix}_bytes_total{{stage="{stage}"}} {b}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """ Writes JSON (*.json) or Prometheus text (anything else, e.g. a node_exporter textfile). """
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            if path.endswith(".json"):
+                json.dump({"timestamp": int(time.time()), "stages": self.snapshot()}, f, indent=2)
+            else:
+                f.write(self.prometheus())
+        os.replace(tmp, path) # Scrapers never see a half-written file
+        return path
@@ -0,0 +1,114 @@
+import os
+import re
+import socket
+import asyncio
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+ARP_TABLE = "/proc/net/arp"
+CONCURRENCY = 32           # Reverse lookups in flight at once
+LOOKUP_TIMEOUT = 2.0       # Seconds before a host is reported as "Unknown Device"
+ATF_COM = 0x02             # /proc/net/arp flag: entry completed (MAC known)
+
+_IPV4 = re.compile(r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})")
+
+
+def _interesting(ip):
+    # Skip multicast and broadcast
+    return not ip.startswith("224.") and not ip.startswith("239.") and ip != "255.255.255.255"
+
+
+# ----------------------------
+# NEIGHBOUR TABLE
+# ----------------------------
+def read_arp_table(path=ARP_TABLE):
+    """ [(ip, mac)] from the kernel neighbour table (no subprocess). Falls back to parsing `arp -a`
+        where /proc/net/arp does not exist (Windows/macOS). Incomplete entries are skipped. """
+    if not os.path.exists(path):
+        return _arp_command()
+    entries, seen = [], set()
+    with open(path) as f:
+        next(f, None) # Header: IP address, HW type, Flags, HW address, Mask, Device
+        for line in f:
+            cols = line.split()
+            if len(cols) < 4: continue
+            ip, flags, mac = cols[0], int(cols[2], 16), cols[3]
+            if flags & ATF_COM and ip not in seen and _interesting(ip):
+                seen.add(ip)
+                entries.append((ip, mac))
+    return entries
+
+
+def _arp_command():
+    output = subprocess.check_output("arp -a", shell=True).decode(errors="replace")
+    entries, seen = [], set()
+    for ip in _IPV4.findall(output):
+        if ip not in seen and _interesting(ip):
+            seen.add(ip)
+            entries.append((ip, ""))
+    return entries
+
+
+# ----------------------------
+# CONCURRENT REVERSE DNS
+# ----------------------------
+async def system_resolver(ip, executor=None):
+    """ Reverse lookup through the OS resolver (blocking getnameinfo, run on executor). discover() hands it a
+        pool with one thread per concurrent lookup: the loop's default executor has only min(32, cpus + 4)
+        threads, and lookups queued behind it would use up their timeout before they even started. """
+    host, _ = await asyncio.get_running_loop().run_in_executor(
+        executor, socket.getnameinfo, (ip, 0), socket.NI_NAMEREQD)
+    return host
+
+
+async def _lookup(ip, mac, resolver, limit, timeout):
+    async with limit:
+        try:
+            hostname = await asyncio.wait_for(resolver(ip), timeout)
+        except Exception: # Timeout, NXDOMAIN, resolver failure
+            hostname = None
+    return {"ip": ip, "hostname": hostname or "Unknown Device", "status": "Online", "mac": mac}
+
+
+async def discover(entries, resolver=system_resolver, concurrency=CONCURRENCY, timeout=LOOKUP_TIMEOUT):
+    """ Async generator: yields a device dict per (ip, mac) as soon as its lookup finishes.
+        resolver(ip) is any coroutine returning a hostname (swap in a stub for tests). """
+    limit = asyncio.Semaphore(concurrency)
+    pool = None
+    if resolver is system_resolver:
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rdns")
+        resolver = functools.partial(system_resolver, executor=pool)
+    tasks = [asyncio.ensure_future(_lookup(ip, mac, resolver, limit, timeout)) for ip, mac in entries]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for t in tasks: t.cancel()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True) # Stuck getnameinfo threads finish on their own
+
+
+def discover_devices(on_device=None, entries=None, resolver=system_resolver,
+                     concurrency=CONCURRENCY, timeout=LOOKUP_TIMEOUT):
+    """ Blocking wrapper: runs discovery on a private event loop, calls on_device(device) as each host
+        resolves and returns the full list. Worst case is about ceil(hosts / concurrency) * timeout. """
+    entries = read_arp_table() if entries is None else entries
+
+    async def run():
+        devices = []
+        async for device in discover(entries, resolver, concurrency, timeout):
+            devices.append(device)
+            if on_device: on_device(device)
+        return devices
+
+    # Not asyncio.run(): it joins the executor, i.e. waits out lookups that already timed out
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close() # Executor shutdown without wait; stuck getnameinfo threads finish on their own
@@ -0,0 +1,148 @@
+import os
+import copy
+import queue
+import threading
+import multiprocessing as mp
+from scanner_engine import ScannerEngine, ScanCancelled, DEFAULT_CACHE
+from archive_scanner import ArchiveScanner, is_archive
+from metrics import Metrics
+from file_walker import WalkRules, walk
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Workers start from a clean interpreter: forking the threaded Tk app can copy locks held by other threads
+START_METHOD = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+PATHS_PER_TASK = 32        # Paths handed to a worker at once (one inference batch)
+IN_FLIGHT_PER_WORKER = 4   # Tasks queued ahead of each worker
+
+
+# ----------------------------
+# WORKER PROCESS
+# ----------------------------
+def _worker(task_q, result_q, cancel, policy=None, archives=False, cache_path=DEFAULT_CACHE):
+    """ Loads the engine once, then scans path batches until it receives the None sentinel.
+        With archives=True, archive members are reported too, under virtual paths (archive.zip!/member). """
+    engine = ScannerEngine(cache_path=cache_path)
+    engine.cancel = cancel # Long hash passes stop mid-file
+    unpacker = ArchiveScanner(engine) if archives else None
+    while True:
+        paths = task_q.get()
+        if paths is None:
+            break
+        if cancel.is_set():
+            continue # Drain without scanning
+        try:
+            for i, (status, conf, color) in engine.iter_scan(paths, policy=policy):
+                result_q.put((os.fspath(paths[i]), status, conf, color))
+        except ScanCancelled:
+            continue # Cancel is set: drain the remaining tasks
+        if unpacker is None: continue
+        for path in paths:
+            if cancel.is_set(): break
+            if not is_archive(path): continue
+            try:
+                for vpath, (status, conf, color) in unpacker.iter_scan(path):
+                    result_q.put((vpath, status, conf, color))
+            except Exception as e:
+                result_q.put((os.fspath(path), "Error", str(e), "yellow"))
+    engine.close()
+    result_q.put(engine.metrics.export()) # Done sentinel carries this worker's stage timings
+
+
+def walk_files(root, skip_dir=None, rules=None):
+    """ Yields every file under root (or root itself if it is a file) as a FileRecord (path-like).
+        rules is a file_walker.WalkRules; skip_dir(path) prunes directories. """
+    if rules is None:
+        rules = WalkRules(skip_dir=skip_dir)
+    elif skip_dir and not rules.skip_dir:
+        rules = copy.copy(rules) # The caller's rules stay as they were
+        rules.skip_dir = skip_dir
+    return walk(root, rules)
+
+
+class ParallelScanner:
+    """ Scans files across a pool of worker processes and streams (path, status, conf, color) back. """
+    def __init__(self, workers=None, max_in_flight=None, paths_per_task=PATHS_PER_TASK, metrics=None, archives=False,
+                 cache_path=DEFAULT_CACHE):
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.archives = archives # Also scan inside zip/tar/gzip/bz2/xz files (see archive_scanner)
+        self.cache_path = cache_path # Workers' verdict cache (None: no cache)
+        self.metrics = metrics if metrics is not None else Metrics() # Workers' stage timings are merged in here
+        self.paths_per_task = paths_per_task
+        self.max_in_flight = max_in_flight or self.workers * IN_FLIGHT_PER_WORKER
+        self.deferred = [] # Files over DEFER_BYTES reported as "Deferred"; see scan_deferred
+        self._mp = mp.get_context(START_METHOD)
+        self._cancel = self._mp.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def scan(self, root, skip_dir=None, rules=None):
+        """ Walks root (see file_walker.walk) and yields results as workers finish them (completion order). """
+        return self.scan_paths(walk_files(root, skip_dir, rules))
+
+    def scan_deferred(self):
+        """ Scans the files deferred so far with the sampled policy (meant to run after the main pass). """
+        paths, self.deferred = self.deferred, []
+        yield from self.scan_paths(paths, policy="sampled")
+
+    def scan_paths(self, paths, policy=None):
+        self._cancel.clear()
+        task_q = self._mp.Queue(maxsize=self.max_in_flight)
+        result_q = self._mp.Queue()
+        procs = [self._mp.Process(target=_worker, args=(task_q, result_q, self._cancel, policy, self.archives, self.cache_path),
+                            daemon=True)
+                 for _ in range(self.workers)]
+        for p in procs: p.start()
+
+        # Feeder blocks on the bounded queue, so the walk never runs far ahead of the workers
+        def feed():
+            try:
+                batch = []
+                for path in paths:
+                    if self._cancel.is_set(): break
+                    batch.append(path)
+                    if len(batch) >= self.paths_per_task:
+                        task_q.put(batch)
+                        batch = []
+                if batch and not self._cancel.is_set():
+                    task_q.put(batch)
+            finally:
+                for _ in procs: task_q.put(None)
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        done = 0
+        try:
+            while done < len(procs):
+                try:
+                    item = result_q.get(timeout=0.5)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in procs): break # Worker died without its sentinel
+                    continue
+                if isinstance(item, dict):
+                    self.metrics.merge(item)
+                    done += 1
+                elif not self._cancel.is_set():
+                    if item[1] == "Deferred": self.deferred.append(item[0])
+                    yield item
+        finally:
+            # Consumer stopped early: cancel and drain so workers can flush and exit
+            if done < len(procs):
+                self._cancel.set()
+                while done < len(procs) and any(p.is_alive() for p in procs):
+                    try:
+                        item = result_q.get(timeout=0.5)
+                        if isinstance(item, dict):
+                            self.metrics.merge(item)
+                            done += 1
+                    except queue.Empty:
+                        pass
+            feeder.join(timeout=1)
+            for p in procs: p.join()
@@ -0,0 +1,97 @@
+import os
+import multiprocessing as mp
+from scanner_engine import StreamDigest, CHUNK_SIZE, PE_HEAD_BYTES
+from parallel_scanner import START_METHOD
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+REGION_BYTES = 16 * 1024 * 1024     # Read at most this much of any one mapping
+PROCESS_BYTES = 64 * 1024 * 1024    # ...and at most this much anonymous memory per process
+POOL_THRESHOLD = 16                 # Fewer regions than this are read in-process
+_PSEUDO = ("[vvar]", "[vvar_vclock]", "[vdso]", "[vsyscall]") # Kernel pages: nothing to scan (or unreadable)
+
+
+def deep_scan_available():
+    return os.path.exists("/proc/self/maps")
+
+
+# ----------------------------
+# /proc/<pid>/maps
+# ----------------------------
+def read_maps(pid):
+    """ [(start, end, perms, offset, dev, inode, path)] for the process, [] if it is gone or not ours. """
+    regions = []
+    try:
+        with open(f"/proc/{pid}/maps") as f:
+            for line in f:
+                cols = line.split(None, 5)
+                if len(cols) < 5: continue
+                start, end = (int(x, 16) for x in cols[0].split("-"))
+                path = cols[5].strip() if len(cols) > 5 else ""
+                regions.append((start, end, cols[1], int(cols[2], 16), cols[3], int(cols[4]), path))
+    except OSError:
+        pass
+    return regions
+
+
+def select_regions(pid, maps, owners):
+    """ Regions worth reading for one process: executable file-backed mappings (each (dev, inode, offset)
+        once across all processes) and readable anonymous memory (heap, stack, private mappings: where
+        injected or unpacked code lives), capped at PROCESS_BYTES per process.
+        owners maps region key -> [pids] and is updated in place. Returns the new [(key, pid, start, end, label)]. """
+    picked, budget = [], PROCESS_BYTES
+    for start, end, perms, offset, dev, inode, path in maps:
+        if "r" not in perms or path in _PSEUDO:
+            continue
+        if inode: # File-backed: only code; a library mapped by 400 processes is read once
+            if "x" not in perms: continue
+            key = (dev, inode, offset)
+            if key in owners:
+                owners[key].append(pid)
+                continue
+            owners[key] = [pid]
+            picked.append((key, pid, start, end, f"{path} +{offset:x}"))
+        elif budget > 0:
+            size = min(end - start, REGION_BYTES, budget)
+            budget -= size
+            owners[(pid, start)] = [pid]
+            picked.append(((pid, start), pid, start, start + size, path or "[anon]"))
+    return picked
+
+
+# ----------------------------
+# REGION READER (worker)
+# ----------------------------
+def region_features(region):
+    """ Streams one region from /proc/<pid>/mem in CHUNK_SIZE reads -> (region, (27,) features or None). """
+    import features
+    _, pid, start, end, _ = region
+    digest = StreamDigest(head_limit=PE_HEAD_BYTES, algos=()) # Memory never matches a file hash: counts only
+    try:
+        with open(f"/proc/{pid}/mem", "rb", buffering=0) as f:
+            f.seek(start)
+            remaining = min(end - start, REGION_BYTES)
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk: break
+                digest.update(chunk)
+                remaining -= len(chunk)
+    except (OSError, OverflowError, ValueError):
+        pass # Unmapped page, exited process or no ptrace access: keep what was read
+    if not digest.size:
+        return region, None
+    return region, features.features_from_counts(digest.counts, digest.size, bytes(digest.head))
+
+
+def iter_region_features(regions, workers=None):
+    """ Yields (region, features) for every readable region, in completion order, across a process pool. """
+    workers = max(1, workers or os.cpu_count() or 1)
+    if len(regions) < POOL_THRESHOLD or workers == 1:
+        results = map(region_features, regions)
+        for region, feats in results:
+            if feats is not None: yield region, feats
+        return
+    with mp.get_context(START_METHOD).Pool(workers) as pool: # Called from app threads: never fork
+        for region, feats in pool.imap_unordered(region_features, regions, chunksize=4):
+            if feats is not None: yield region, feats
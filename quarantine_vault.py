@@ -0,0 +1,280 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+CHUNK_SIZE = 1024 * 1024   # Streamed in and out: memory stays flat for large payloads
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+BULK_WORKERS = 4           # Threads for quarantine_many (hashlib, zlib and zstd release the GIL)
+
+try:
+    import zstandard
+    DEFAULT_CODEC = "zstd"
+except ImportError:
+    zstandard = None
+    DEFAULT_CODEC = "zlib"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256      TEXT PRIMARY KEY,
+    codec       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256         TEXT NOT NULL REFERENCES objects (sha256),
+    path           TEXT NOT NULL,
+    mode           INTEGER NOT NULL,
+    uid            INTEGER NOT NULL,
+    gid            INTEGER NOT NULL,
+    mtime_ns       INTEGER NOT NULL,
+    quarantined_at INTEGER NOT NULL,
+    status         TEXT NOT NULL,
+    conf           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_sha256 ON entries (sha256);
+"""
+_COLUMNS = ("id", "sha256", "path", "mode", "uid", "gid", "mtime_ns", "quarantined_at", "status", "conf")
+
+
+def _compressor(codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(ZLIB_LEVEL)
+
+
+def _decompressor(codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Payload is zstd-compressed: pip install zstandard to restore it")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+
+class QuarantineVault:
+    """ Content-addressed quarantine: each payload is stored once under objects/<sha256>, compressed
+        (zstd when available, else zlib), and an SQLite index records every quarantined copy with its
+        original path, mode, owner, mtime, time of quarantine and verdict. Same-named or identical files
+        never collide. Safe to share between threads. """
+    def __init__(self, root, codec=DEFAULT_CODEC):
+        self.root = root
+        self.codec = codec
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    # --- store ---
+    def _store(self, path):
+        """ One pass over the file: SHA-256 and compression into a temp object, renamed to its digest
+            (or dropped if that content is already stored). Returns (sha256, stat, stored_size, created). """
+        st = os.stat(path)
+        sha, comp = hashlib.sha256(), _compressor(self.codec)
+        fd, tmp = tempfile.mkstemp(dir=self.objects_dir, prefix=".incoming-")
+        try:
+            with open(path, "rb") as src, os.fdopen(fd, "wb") as out:
+                buf = bytearray(CHUNK_SIZE)
+                view = memoryview(buf)
+                while True:
+                    n = src.readinto(buf)
+                    if not n: break
+                    sha.update(view[:n])
+                    out.write(comp.compress(view[:n]))
+                out.write(comp.flush())
+                stored = out.tell()
+            digest = sha.hexdigest()
+            dest = self.object_path(digest)
+            created = not os.path.exists(dest)
+            if created:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp, dest)
+            else:
+                os.remove(tmp) # Deduplicated: identical payload already in the vault
+            return digest, st, stored, created
+        except BaseException:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+
+    def _index(self, rows):
+        """ rows: [(sha256, stat, stored_size, path, status, conf)] -> entry ids, in one transaction. """
+        now = time.time_ns()
+        ids = []
+        with self._lock:
+            try:
+                for sha, st, stored, path, status, conf in rows:
+                    self._db.execute("INSERT OR IGNORE INTO objects VALUES (?, ?, ?, ?)",
+                                     (sha, self.codec, st.st_size, stored))
+                    cur = self._db.execute(
+                        "INSERT INTO entries (sha256, path, mode, uid, gid, mtime_ns, quarantined_at, status, conf) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (sha, os.path.abspath(path), st.st_mode, st.st_uid, st.st_gid, st.st_mtime_ns, now, status, conf))
+                    ids.append(cur.lastrowid)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return ids
+
+    def quarantine(self, path, status="UNSAFE", conf=""):
+        """ Moves one file into the vault. Returns the entry id. """
+        [(_, ok, result)] = self._quarantine_batch([(path, status, conf)], workers=1)
+        if not ok:
+            raise result
+        return result
+
+    def quarantine_many(self, items, workers=BULK_WORKERS):
+        """ items: [(path, status, conf)]. Payloads are stored across a thread pool, indexed in a single
+            transaction, and only then are the originals removed: a crash or a failed insert (e.g. database
+            is locked) leaves every original in place. Returns [(path, True, entry_id) or (path, False, error)]
+            in input order. """
+        return [(path, ok, r if ok else str(r)) for path, ok, r in self._quarantine_batch(items, workers)]
+
+    def _quarantine_batch(self, items, workers):
+        """ quarantine_many with the exceptions themselves as errors. """
+        items = list(items)
+        def store(item):
+            try:
+                return self._store(item[0])
+            except Exception as e:
+                return e
+        with ThreadPoolExecutor(max(1, workers)) as pool:
+            stored = list(pool.map(store, items))
+        results = [(path, False, r) if isinstance(r, Exception) else None for (path, _, _), r in zip(items, stored)]
+        todo = [k for k, r in enumerate(results) if r is None]
+        try:
+            ids = self._index([stored[k][:3] + items[k] for k in todo])
+        except Exception as e:
+            # Nothing was indexed: drop the payloads this batch added, the originals are untouched
+            for k in todo:
+                sha, _, _, created = stored[k]
+                if created and not self._referenced(sha):
+                    try: os.remove(self.object_path(sha))
+                    except OSError: pass
+                results[k] = (items[k][0], False, e)
+            return results
+        failed = []
+        for k, entry_id in zip(todo, ids):
+            path = items[k][0]
+            try:
+                os.remove(path)
+                results[k] = (path, True, entry_id)
+            except OSError as e:
+                failed.append(entry_id) # Still on disk (locked, read-only): not quarantined after all
+                results[k] = (path, False, e)
+        if failed:
+            self.purge(failed)
+        return results
+
+    def _referenced(self, sha256):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    # --- query ---
+    def entries(self, path=None):
+        """ Index rows as dicts, newest first (optionally only those quarantined from `path`). """
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM entries"
+        args = ()
+        if path is not None:
+            sql += " WHERE path = ?"
+            args = (os.path.abspath(path),)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY id DESC", args).fetchall()
+        return [dict(zip(_COLUMNS, r)) for r in rows]
+
+    def entry(self, entry_id):
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No quarantine entry {entry_id}")
+        return dict(zip(_COLUMNS, row))
+
+    def stats(self):
+        """ {entries, objects, bytes (original), stored_bytes (on disk)}. """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            objects, size, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM objects").fetchone()
+        return {"entries": entries, "objects": objects, "bytes": size, "stored_bytes": stored}
+
+    # --- restore / purge ---
+    def read(self, entry_id):
+        """ Yields the decompressed payload of an entry in chunks (e.g. to rescan it). """
+        sha = self.entry(entry_id)["sha256"]
+        with self._lock:
+            codec = self._db.execute("SELECT codec FROM objects WHERE sha256 = ?", (sha,)).fetchone()[0]
+        dec = _decompressor(codec)
+        with open(self.object_path(sha), "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk: break
+                yield dec.decompress(chunk)
+        yield dec.flush()
+
+    def restore(self, entry_id, dest=None, overwrite=False):
+        """ Writes the payload back (to its original path unless dest is given) with its mode, mtime and,
+            where permitted, owner; then drops the entry. Returns the restored path. """
+        e = self.entry(entry_id)
+        dest = dest or e["path"]
+        if os.path.exists(dest) and not overwrite:
+            raise FileExistsError(dest)
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        sha = hashlib.sha256()
+        tmp = dest + ".restoring"
+        with open(tmp, "wb") as out:
+            for chunk in self.read(entry_id):
+                sha.update(chunk)
+                out.write(chunk)
+        if sha.hexdigest() != e["sha256"]:
+            os.remove(tmp)
+            raise IOError(f"Quarantine object {e['sha256']} is corrupt")
+        os.chmod(tmp, e["mode"] & 0o7777)
+        try: os.chown(tmp, e["uid"], e["gid"])
+        except (AttributeError, PermissionError): pass # Windows / not root: keep the current owner
+        os.utime(tmp, ns=(e["mtime_ns"], e["mtime_ns"]))
+        os.replace(tmp, dest)
+        self.purge([entry_id])
+        return dest
+
+    def purge(self, entry_ids=None, older_than=None):
+        """ Deletes entries (by id, or quarantined more than older_than seconds ago) and any payload no
+            longer referenced. purge() with no arguments only collects unreferenced payloads. Returns entries removed. """
+        with self._lock:
+            removed = 0
+            if entry_ids is not None:
+                ids = list(entry_ids)
+                for i in range(0, len(ids), 500): # SQLite parameter limit
+                    part = ids[i:i + 500]
+                    removed += self._db.execute(
+                        f"DELETE FROM entries WHERE id IN ({','.join('?' * len(part))})", part).rowcount
+            if older_than is not None:
+                removed += self._db.execute("DELETE FROM entries WHERE quarantined_at < ?",
+                                            (time.time_ns() - int(older_than * 1e9),)).rowcount
+            orphans = [r[0] for r in self._db.execute(
+                "SELECT sha256 FROM objects WHERE sha256 NOT IN (SELECT sha256 FROM entries)")]
+            self._db.executemany("DELETE FROM objects WHERE sha256 = ?", [(s,) for s in orphans])
+            self._db.commit()
+        for sha in orphans:
+            try: os.remove(self.object_path(sha))
+            except FileNotFoundError: pass
+            try: os.rmdir(os.path.dirname(self.object_path(sha))) # Shard directory, if now empty
+            except OSError: pass
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._db.close()
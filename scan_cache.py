@@ -0,0 +1,145 @@
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+MAX_ENTRIES = 500_000      # LRU bound (rows)
+EVICT_FRACTION = 0.1       # Drop the oldest 10% when the bound is hit
+COMMIT_EVERY = 256         # Batch writes so each scan does not pay for an fsync
+COMMIT_INTERVAL = 2.0      # ...but never hold uncommitted rows longer than this (seconds)
+
+SCHEMA_VERSION = 2         # Bump when the table layout changes; older caches are dropped
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    dev       INTEGER NOT NULL,
+    ino       INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    md5       TEXT NOT NULL,
+    sha1      TEXT NOT NULL,
+    sha256    TEXT NOT NULL,
+    features  BLOB,
+    status    TEXT NOT NULL,
+    conf      TEXT NOT NULL,
+    color     TEXT NOT NULL,
+    model     TEXT NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (dev, ino, size, mtime_ns)
+);
+CREATE INDEX IF NOT EXISTS verdicts_lru ON verdicts (last_used);
+"""
+
+
+def model_fingerprint(model_path):
+    """ MD5 of the model file; cached verdicts are only valid for the model that produced them. """
+    try:
+        with open(model_path, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
+    except OSError:
+        return "none"
+
+
+def stat_key(st):
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class VerdictCache:
+    """ On-disk verdict cache keyed by (device, inode, size, mtime_ns). Stores the file's digests,
+        features and verdict. Safe to share between threads and processes. """
+    def __init__(self, db_path, fingerprint, max_entries=MAX_ENTRIES):
+        self.db_path = db_path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._touched = {} # key -> last_used of cache hits, written in batches by _commit
+        self._last_commit = time.monotonic()
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS verdicts")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.executescript(_SCHEMA)
+        # Entries from another model version are stale
+        self._db.execute("DELETE FROM verdicts WHERE model != ?", (fingerprint,))
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def get(self, st):
+        """ Returns (digests, features, status, conf, color) for an unchanged file, else None. """
+        key = stat_key(st)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT md5, sha1, sha256, features, status, conf, color FROM verdicts "
+                "WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND model=?",
+                key + (self.fingerprint,)).fetchone()
+            if row is None:
+                return None
+            # No write per hit: the LRU touch waits for the next commit
+            self._touched[key] = time.time_ns()
+            self._tick()
+        md5, sha1, sha256, feats, status, conf, color = row
+        feats = np.frombuffer(feats, dtype=np.float64).reshape(1, -1) if feats else None
+        return {"md5": md5, "sha1": sha1, "sha256": sha256}, feats, status, conf, color
+
+    def put(self, st, digests, features, status, conf, color):
+        blob = None if features is None else np.asarray(features, dtype=np.float64).tobytes()
+        key = stat_key(st)
+        values = (digests["md5"], digests["sha1"], digests["sha256"], blob,
+                  status, conf, color, self.fingerprint, time.time_ns())
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", key + values)
+            if cur.rowcount:
+                self._count += 1 # Only new rows grow the table
+            else:
+                self._db.execute(
+                    "UPDATE verdicts SET md5=?, sha1=?, sha256=?, features=?, status=?, conf=?, color=?, model=?, "
+                    "last_used=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=?", values + key)
+                self._touched.pop(key, None)
+            if self._count > self.max_entries:
+                self._evict()
+            self._tick()
+
+    def _evict(self):
+        self._write_touches() # Evict by up-to-date recency
+        drop = max(1, int(self.max_entries * EVICT_FRACTION)) + self._count - self.max_entries
+        self._db.execute(
+            "DELETE FROM verdicts WHERE rowid IN "
+            "(SELECT rowid FROM verdicts ORDER BY last_used LIMIT ?)", (drop,))
+        self._count = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def _tick(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY or time.monotonic() - self._last_commit > COMMIT_INTERVAL:
+            self._commit()
+
+    def _write_touches(self):
+        if not self._touched: return
+        self._db.executemany(
+            "UPDATE verdicts SET last_used=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=?",
+            [(used,) + key for key, used in self._touched.items()])
+        self._touched.clear()
+
+    def _commit(self):
+        self._write_touches()
+        self._db.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def __len__(self):
+        return self._count
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -1,17 +1,192 @@
 import os
+import mmap
 import shutil
 import hashlib
-import numpy as np
-import joblib
+import contextlib
 import tempfile
 import threading
 import time
-import pandas as pd
-import pefile
+from hash_index import HashIndex, index_path, ensure_index
+from metrics import Metrics, now_ns
+from file_walker import FileRecord
+# NumPy, pefile (features), joblib and pandas are imported on first use: `import scanner_engine` stays cheap
+
+# Streaming read window and PE header budget
+CHUNK_SIZE = 1024 * 1024          # 1 MB per read
+PE_HEAD_BYTES = 4 * 1024 * 1024   # PE parsing only sees the first 4 MB (buffered reads only; mapped files parse in place)
+
+# Batched inference: one predict_proba call per batch
+BATCH_SIZE = 256
+BATCH_DEADLINE = 0.25             # Flush a partial batch after this many seconds
+
+# Digests computed in the same pass, checked in this order
+HASH_ALGOS = ("md5", "sha1", "sha256")
+
+# Risk shown for a "suspicious" signature hit the model doesn't confirm (below the app's 90% alert threshold)
+SUSPICIOUS_SCORE = 50
+
+# Size tiers (see policy_for): full pass, hash + sampled windows, or deferred to a background job
+FULL_SCAN_BYTES = 64 * 1024 * 1024
+DEFER_BYTES = 1024 * 1024 * 1024
+# Sampled windows: the head (PE headers), the tail (overlays, appended payloads) and evenly spaced blocks
+SAMPLE_TAIL_BYTES = 1024 * 1024
+SAMPLE_BLOCKS = 16
+SAMPLE_BLOCK_BYTES = 256 * 1024
+HASH_CHUNK_SIZE = 8 * 1024 * 1024 # Hash-only reads can be bigger: no per-byte counting
+
+
+class ScanCancelled(Exception):
+    pass
+
+
+def hash_verdict(algo):
+    return "UNSAFE", f"100% (Hash:{algo.upper()})", "red"
+
+
+def signature_verdict(name):
+    return "UNSAFE", f"100% (Sig:{name})", "red"
+
+
+def suspicious_verdict(name, verdict=None):
+    """ A "suspicious" signature hit (packer, generic script marker) never condemns a file on its own:
+        an UNSAFE model verdict keeps its score and names the hit, anything else becomes SUSPICIOUS. """
+    if verdict is not None and verdict[0] == "UNSAFE":
+        return verdict[0], f"{verdict[1]} (+Sig:{name})", verdict[2]
+    return "SUSPICIOUS", f"{SUSPICIOUS_SCORE:.0f}% (Sig:{name})", "orange"
+
+
+def policy_for(size):
+    """ "full" (every byte counted), "sampled" (streamed hash, features from windows) or "deferred". """
+    if size <= FULL_SCAN_BYTES: return "full"
+    return "sampled" if size <= DEFER_BYTES else "deferred"
+
+
+def sample_windows(size, head=PE_HEAD_BYTES, tail=SAMPLE_TAIL_BYTES, blocks=SAMPLE_BLOCKS, block=SAMPLE_BLOCK_BYTES):
+    """ Sorted, non-overlapping (offset, length) windows covering head, tail and `blocks` evenly spaced blocks. """
+    spans = [(0, head), (max(0, size - tail), tail)]
+    if blocks > 1 and size > block:
+        step = (size - block) / (blocks - 1)
+        spans += [(int(k * step), block) for k in range(blocks)]
+    windows = []
+    for off, n in sorted((off, min(n, size - off)) for off, n in spans if off < size):
+        if windows and off <= windows[-1][0] + windows[-1][1]: # Overlaps or touches the previous one
+            prev_off, prev_n = windows[-1]
+            windows[-1] = (prev_off, max(prev_n, off + n - prev_off))
+        elif n > 0:
+            windows.append((off, n))
+    return windows
+
+
+def deferred_verdict(size):
+    return "Deferred", f"{size / 2**30:.1f} GB", "gray"
+
+
+def _pread(f, n, offset):
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), n, offset)
+    f.seek(offset) # Windows: no pread
+    return f.read(n)
+
+
+class StreamDigest:
+    """ Running counters over a file's bytes: MD5/SHA-1/SHA-256, 256-bin byte counts, size, the head for PE parsing
+        and byte-signature matches (when a signatures.SignatureSet is given). Memory stays constant no matter how large the file is. """
+    def __init__(self, head_limit=PE_HEAD_BYTES, algos=HASH_ALGOS, timed=False, signatures=None):
+        import numpy as np
+        import features
+        self._byte_counts = features.byte_counts
+        # Stage timings for this file ({stage: [ns, bytes]}), handed to Metrics in one call when it is done
+        self.timings = {} if timed else None
+        self.hashers = {algo: hashlib.new(algo) for algo in algos}
+        self.counts = np.zeros(256, dtype=np.int64)
+        self.size = 0
+        self.counted = 0 # Bytes behind self.counts: == size unless features were sampled
+        self.head_limit = head_limit
+        self.head = bytearray()
+        self.sig_scan = signatures.scanner() if signatures is not None and len(signatures) else None
+        self._matches = None
+
+    def update(self, chunk):
+        t0 = now_ns()
+        for h in self.hashers.values():
+            h.update(chunk)
+        t1 = now_ns()
+        self.counts += self._byte_counts(chunk)
+        if self.timings is not None:
+            self.time("hash", t1 - t0, len(chunk))
+            self.time("base_features", now_ns() - t1, len(chunk))
+        self.size += len(chunk)
+        self.counted += len(chunk)
+        self.update_signatures(chunk)
+        if len(self.head) < self.head_limit:
+            self.head += chunk[:self.head_limit - len(self.head)]
+
+    def update_hashes(self, chunk):
+        """ Hash-only pass (sampled policy): the bytes count towards size but not towards the byte counts. """
+        t = now_ns()
+        for h in self.hashers.values():
+            h.update(chunk)
+        if self.timings is not None:
+            self.time("hash", now_ns() - t, len(chunk))
+        self.size += len(chunk)
+        self.update_signatures(chunk)
+
+    def update_signatures(self, chunk):
+        if self.sig_scan is None: return
+        t = now_ns()
+        self.sig_scan.feed(chunk)
+        if self.timings is not None:
+            self.time("signatures", now_ns() - t, len(chunk))
+
+    def signature_matches(self):
+        """ [(offset, name)] of the signatures found in the bytes seen so far (call once the stream is done). """
+        if self._matches is None:
+            if self.sig_scan is None:
+                self._matches = []
+            else:
+                t = now_ns()
+                self._matches = self.sig_scan.finish()
+                self.time("signatures", now_ns() - t)
+        return self._matches
+
+    def update_counts(self, window):
+        """ Byte counts for one sampled window. """
+        t = now_ns()
+        self.counts += self._byte_counts(window)
+        if self.timings is not None:
+            self.time("base_features", now_ns() - t, len(window))
+        self.counted += len(window)
+
+    def time(self, stage, ns, nbytes=0):
+        if self.timings is None: return
+        t = self.timings.get(stage)
+        if t is None:
+            self.timings[stage] = [ns, nbytes]
+        else:
+            t[0] += ns
+            t[1] += nbytes
+
+    @property
+    def printable(self):
+        # Bytes 32..126 (same mask as extract_features)
+        return int(self.counts[32:127].sum())
+
+    def hexdigest(self):
+        return self.hashers["md5"].hexdigest()
+
+    def hexdigests(self):
+        return {algo: h.hexdigest() for algo, h in self.hashers.items()}
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE = os.path.join(BASE_DIR, "scan_cache.db")
+
 
 class ScannerEngine:
-    def __init__(self):
-        self.base_dir = os.path.dirname(os.path.abspath(__file__))
+    """ background=True returns immediately and loads the model, signatures and cache on a daemon thread;
+        scans wait for it (see wait_ready). """
+    def __init__(self, cache_path=DEFAULT_CACHE, background=False):
+        self.base_dir = BASE_DIR
         self.model_path = os.path.join(self.base_dir, "scanner_model.pkl")
         self.quarantine_dir = os.path.join(self.base_dir, "quarantine")
         self.malware_csv = os.path.join(self.base_dir, "Malware dataset.csv")
@@ -20,21 +195,131 @@ class ScannerEngine:
         if not os.path.exists(self.quarantine_dir):
             os.makedirs(self.quarantine_dir)
 
-        self.model = self._load_model()
-        self.hashes = self._load_hashes()
+        self.model_md5 = "none"
+        self.model = None
+        self.hashes = {algo: set() for algo in HASH_ALGOS}
+        self.signatures = None   # signatures.SignatureSet from signatures.txt (byte patterns, checked in the hash pass)
+        self.cache = None
+        self.metrics = Metrics() # Per-stage timings (see stage_stats / metrics.dump)
+        self.deferred = []       # Paths over DEFER_BYTES seen by iter_scan, for a later iter_scan(policy="sampled")
+        self.cancel = None       # Optional Event: stops a sampled file's hash pass early
+        self._vault = None
+        self._ready = threading.Event()
+        if background:
+            threading.Thread(target=self._load, args=(cache_path,), daemon=True).start()
+        else:
+            self._load(cache_path)
+
+    def _load(self, cache_path):
+        try:
+            from scan_cache import model_fingerprint
+            self.model_md5 = model_fingerprint(self.model_path)
+            self.model = self._load_model()
+            self.hashes = self._load_hashes()
+            self.signatures = self._load_signatures()
+            self.cache = self._open_cache(cache_path)
+        finally:
+            self._ready.set() # A failed load still unblocks scans (they report "No Model")
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """ Blocks until the model and signatures are loaded. Returns False on timeout. """
+        return self._ready.wait(timeout)
 
     def _load_model(self):
+        from compiled_model import CompiledForest, compiled_path_for
+        # Compiled flat forest (python compiled_model.py): NumPy only, no scikit-learn import
+        compiled = compiled_path_for(self.model_path)
+        if os.path.exists(compiled):
+            try:
+                model = CompiledForest(compiled)
+                if model.source_md5 == self.model_md5: # Ignore exports of an older pickle
+                    return model
+            except Exception:
+                pass
         try:
             if os.path.exists(self.model_path):
+                import joblib
                 return joblib.load(self.model_path)
         except:
             pass
         return None
 
+    def _open_cache(self, cache_path):
+        # Verdict cache is optional: pass cache_path=None to disable
+        if not cache_path:
+            return None
+        try:
+            from scan_cache import VerdictCache
+            fingerprint = self.model_md5 if self.model else "none"
+            if self.signatures is not None:
+                fingerprint += ":" + self.signatures.fingerprint # Editing signatures.txt invalidates cached verdicts
+            return VerdictCache(cache_path, fingerprint)
+        except Exception:
+            return None
+
+    def close(self):
+        self._ready.wait() # Don't let a background load open the cache after we closed it
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self._vault is not None:
+            self._vault.close()
+            self._vault = None
+
     def _load_hashes(self):
+        """ Returns {algo: signature set} for MD5/SHA-1/SHA-256. """
+        hashes = {}
+        try:
+            # First run (or a newer feed): compile the feeds into indexes once
+            ensure_index((self.malware_csv, os.path.join(self.base_dir, "malware_hashes.pkl")), self.base_dir)
+        except Exception:
+            pass # Read-only install or unreadable feed: the CSV fallback below still works
+        for algo in HASH_ALGOS:
+            # Compiled index (python hash_index.py): mapped, near-zero memory and startup
+            if os.path.exists(index_path(algo, self.base_dir)):
+                try:
+                    hashes[algo] = HashIndex(index_path(algo, self.base_dir))
+                except Exception:
+                    pass
+
+        # Legacy: raw CSV feed into one in-memory set for any algo without an index
+        if len(hashes) < len(HASH_ALGOS):
+            legacy = self._load_csv_hashes()
+            for algo in HASH_ALGOS:
+                hashes.setdefault(algo, legacy)
+        return hashes
+
+    def match_hash(self, digests):
+        """ Returns the first algorithm whose digest is a known signature, else None. """
+        for algo in HASH_ALGOS:
+            if algo in digests and digests[algo] in self.hashes[algo]:
+                return algo
+        return None
+
+    def _load_signatures(self):
+        from signatures import SignatureSet, SIGNATURES_PATH
+        if not os.path.exists(SIGNATURES_PATH):
+            return None
+        try:
+            return SignatureSet.load(SIGNATURES_PATH)
+        except Exception:
+            return None
+
+    def match_signatures(self, path):
+        """ [(offset, name)] of the byte signatures in a file, sorted by offset (each signature once). """
+        self._ready.wait()
+        with self.open_digest(path) as digest:
+            return digest.signature_matches()
+
+    def _load_csv_hashes(self):
         hashes = set()
         if os.path.exists(self.malware_csv):
             try:
+                import pandas as pd
                 df = pd.read_csv(self.malware_csv)
                 if "hash" in df.columns:
                     hashes = set(df["hash"].astype(str))
@@ -44,117 +329,332 @@ class ScannerEngine:
 
     def extract_pe_features(self, data):
         """ Extract 8 solid features from PE Header """
-        try:
-            pe = pefile.PE(data=data)
-            
-            # 1. Number of Sections (Malware often has weird counts)
-            num_sections = len(pe.sections)
-            
-            # 2. Entropy of Text Section (Code)
-            text_entropy = 0.0
-            for section in pe.sections:
-                if b".text" in section.Name:
-                    text_entropy = section.get_entropy()
-                    break
-            
-            # 3. Import Count
-            try: num_imports = len(pe.DIRECTORY_ENTRY_IMPORT)
-            except: num_imports = 0
-
-            # 4. Export Count
-            try: num_exports = len(pe.DIRECTORY_ENTRY_EXPORT.symbols)
-            except: num_exports = 0
-            
-            # 5. Has Debug Info?
-            has_debug = 1 if hasattr(pe, 'DIRECTORY_ENTRY_DEBUG') else 0
-            
-            # 6. Has Relocations?
-            has_reloc = 1 if hasattr(pe, 'DIRECTORY_ENTRY_BASERELOC') else 0
-            
-            # 7. Has Resources?
-            has_rsrc = 1 if hasattr(pe, 'DIRECTORY_ENTRY_RESOURCE') else 0
-            
-            # 8. Entry Point (Address)
-            entry_point = pe.OPTIONAL_HEADER.AddressOfEntryPoint
-            
-            return [num_sections, text_entropy, num_imports, num_exports, has_debug, has_reloc, has_rsrc, entry_point]
-
-        except:
-            # Corrupt PE or parse error
-            return [0] * 8
+        import features
+        return features.extract_pe_features(data)
 
     def extract_features(self, data):
-        # Base Features (19)
-        if not data: return np.zeros(27) # 19 + 8
+        """ 27 features (19 base + 8 PE) as a (1, 27) row. """
+        import features
+        return features.extract_features(data).reshape(1, -1)
 
-        arr = np.frombuffer(data, dtype=np.uint8)
-        size = len(data)
-        
-        # 1. Byte Histogram (16 bins)
-        hist, _ = np.histogram(arr, bins=16, range=(0, 256), density=True)
-        # 2. Entropy
-        probs = np.bincount(arr, minlength=256) / size
-        entropy = -np.sum(probs[probs > 0] * np.log2(probs[probs > 0]))
-        # 3. Structure
-        printable = np.sum((arr >= 32) & (arr <= 126)) / size
-        log_size = np.log1p(size)
-        
-        base_feats = np.concatenate([hist, [entropy, printable, log_size]])
+    def features_from_counts(self, counts, size, head):
+        """ Builds the 27 features from byte counts (identical to a full-buffer pass). """
+        import features
+        return features.features_from_counts(counts, size, head).reshape(1, -1)
 
-        # PE Features (8) - Hybrid Approach
-        # Check for MZ header
-        if data.startswith(b'MZ'):
-            pe_feats = self.extract_pe_features(data)
-        else:
-            pe_feats = [0] * 8
-            
-        return np.concatenate([base_feats, pe_feats]).reshape(1, -1)
+    def digest_features(self, digest):
+        """ features_from_counts for a StreamDigest, timing the base and PE stages into the digest. """
+        import numpy as np
+        import features
+        t0 = now_ns()
+        counts = digest.counts
+        if digest.counted and digest.counted != digest.size:
+            counts = counts * (digest.size / digest.counted) # Sampled: the windows stand in for the whole file
+        base = features.base_features(counts, [digest.size])[0]
+        t1 = now_ns()
+        pe = features.pe_features(digest.head)
+        digest.time("base_features", t1 - t0)
+        digest.time("pe_features", now_ns() - t1)
+        return np.concatenate([base, pe]).reshape(1, -1)
 
-    def scan_file(self, path):
-        """ Returns: (status, confidence_str, color) """
+    def stage_stats(self):
+        """ Per-stage timing summary: {stage: {count, total_ms, mean_us, p50_us, p99_us, bytes, mb_per_s}}. """
+        return self.metrics.snapshot()
+
+    def new_digest(self):
+        """ An empty StreamDigest wired to this engine's signatures and metrics (feed it with update()). """
+        return StreamDigest(timed=self.metrics.enabled, signatures=self.signatures)
+
+    def triage(self, digest, digests=None):
+        """ Hash, then byte-signature checks on a finished digest. Returns (verdict, None, None) on a hash or
+            "malware" signature match, else (None, features, hint) for the model: features are None when no model
+            is loaded, hint is the first "suspicious" signature found (see finish_verdict) or None. """
+        algo = self.match_hash(digests or digest.hexdigests())
+        if algo:
+            return hash_verdict(algo), None, None
+        hint = None
+        for _, name in digest.signature_matches(): # In file order: the first match decides
+            if name not in self.signatures.suspicious:
+                return signature_verdict(name), None, None
+            hint = hint or name
+        return None, (self.digest_features(digest) if self.model else None), hint
+
+    @staticmethod
+    def finish_verdict(verdict, hint):
+        """ Applies a "suspicious" signature hint to a model verdict (or to no verdict, when there is no model). """
+        if hint is None:
+            return verdict or ("Unknown", "No Model", "gray")
+        if verdict is None or verdict[0] in ("SAFE", "UNSAFE"):
+            return suspicious_verdict(hint, verdict)
+        return verdict
+
+    def digest_file(self, path, chunk_size=CHUNK_SIZE):
+        """ Reads a file once in fixed-size chunks and returns its StreamDigest. """
+        digest = self.new_digest()
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        with open(path, "rb") as f:
+            while True:
+                t = now_ns()
+                n = f.readinto(buf)
+                digest.time("read", now_ns() - t, n)
+                if not n: break
+                digest.update(view[:n])
+        return digest
+
+    def digest_buffer(self, buf, chunk_size=CHUNK_SIZE):
+        """ Walks an in-memory buffer (e.g. an mmap) in chunk-sized views; no bytes are copied. """
+        digest = StreamDigest(head_limit=0, timed=self.metrics.enabled, signatures=self.signatures)
+        with memoryview(buf) as view:
+            for off in range(0, len(view), chunk_size):
+                with view[off:off + chunk_size] as chunk:
+                    digest.update(chunk)
+        digest.head = buf
+        return digest
+
+    @contextlib.contextmanager
+    def open_digest(self, path):
+        """ Yields the file's StreamDigest. The file is mapped read-only while the block runs,
+            so digest.head can be handed to pefile without a copy. """
+        t = now_ns()
+        try:
+            f = open(path, "rb")
+        except PermissionError:
+            # Locked by another process: fall back to the shadow copy
+            yield self._shadow_digest(path)
+            return
+
+        with f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty or unmappable (pipes, /proc): plain buffered reads
+                opened = now_ns() - t
+                digest = self.digest_file(path)
+                digest.time("open", opened)
+                yield digest
+                return
+        opened = now_ns() - t
+        try:
+            digest = self.digest_buffer(mm)
+            digest.time("open", opened)
+            yield digest
+        finally:
+            mm.close()
+
+    def sample_digest(self, path):
+        """ Sampled policy: byte counts and PE head from positional reads of sample_windows(), then one
+            sequential hash-only pass (no byte counting). The hash pass stops early once self.cancel is set. """
+        digest = StreamDigest(head_limit=0, timed=self.metrics.enabled, signatures=self.signatures)
+        t = now_ns()
+        with open(path, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            digest.time("open", now_ns() - t)
+            for off, n in sample_windows(size):
+                t = now_ns()
+                window = _pread(f, n, off)
+                digest.time("read", now_ns() - t, len(window))
+                if off == 0:
+                    digest.head = window[:PE_HEAD_BYTES]
+                digest.update_counts(window)
+
+            buf = bytearray(HASH_CHUNK_SIZE)
+            view = memoryview(buf)
+            f.seek(0)
+            while True:
+                if self.cancel is not None and self.cancel.is_set():
+                    raise ScanCancelled(path)
+                t = now_ns()
+                n = f.readinto(buf)
+                digest.time("read", now_ns() - t, n)
+                if not n: break
+                digest.update_hashes(view[:n])
+        return digest
+
+    def _shadow_digest(self, path):
+        """ Copies the file to a temp file and streams the copy (only used when the file is locked). """
         tmp_path = None
         try:
-            # Shadow Copy Read
+            t = now_ns()
             with tempfile.NamedTemporaryFile(delete=False) as tmp:
                 tmp_path = tmp.name
             shutil.copy2(path, tmp_path)
-            
-            with open(tmp_path, "rb") as f:
-                data = f.read()
-
-            # Hash Check
-            md5 = hashlib.md5(data).hexdigest()
-            if md5 in self.hashes:
-                return "UNSAFE", "100% (Hash)", "red"
-
-            # AI Check
-            if self.model:
-                feats = self.extract_features(data)
-                probs = self.model.predict_proba(feats)[0]
-                conf = probs[1] * 100
-                if probs[1] > 0.5:
-                    return "UNSAFE", f"{conf:.1f}%", "red"
-                else:
-                    return "SAFE", f"{100-conf:.1f}%", "green"
-            else:
-                return "Unknown", "No Model", "gray"
-
-        except Exception as e:
-            return "Error", str(e), "yellow"
+            copied = now_ns() - t
+            digest = self.digest_file(tmp_path)
+            digest.time("copy", copied, digest.size)
+            return digest
         finally:
             if tmp_path and os.path.exists(tmp_path):
                 try: os.remove(tmp_path) 
                 except: pass
 
-    def quarantine_file(self, path):
+    def stream_features(self, path):
+        """ Streaming equivalent of extract_features(open(path).read()). Returns (md5, features). """
+        self._ready.wait()
+        with self.open_digest(path) as digest:
+            feats = self.digest_features(digest)
+        self.metrics.add_many(digest.timings)
+        return digest.hexdigest(), feats
+
+    def scan_file(self, path):
+        """ Returns: (status, confidence_str, color) """
+        return self.scan_many([path])[0]
+
+    def scan_many(self, paths, batch_size=BATCH_SIZE, deadline=BATCH_DEADLINE):
+        """ Scans paths with batched inference. Returns [(status, confidence_str, color)] in input order. """
+        paths = list(paths)
+        results = [None] * len(paths)
+        for i, verdict in self.iter_scan(paths, batch_size, deadline):
+            results[i] = verdict
+        return results
+
+    def iter_scan(self, paths, batch_size=BATCH_SIZE, deadline=BATCH_DEADLINE, policy=None):
+        """ Yields (index, verdict) in completion order. paths may hold file_walker.FileRecords.
+            Rows that need the model are stacked and classified once batch_size rows or deadline seconds have accumulated.
+            policy forces a tier; by default it follows the file size (policy_for). Deferred files get a
+            "Deferred" verdict and are appended to self.deferred (see scan_deferred); model verdicts from sampled files say so in conf.
+            Raises ScanCancelled once self.cancel is set during a sampled hash pass. """
+        self._ready.wait()
+        pending = [] # (index, stat, digests, features, policy)
+        started = 0.0
+        for i, path in enumerate(paths):
+            # Checked before anything can `continue`: a long run of cache hits must not hold queued rows past the deadline
+            if pending and (len(pending) >= batch_size or time.monotonic() - started >= deadline):
+                yield from self._flush_batch(pending)
+                pending = []
+            try:
+                # Walker records carry their lstat (no inode on Windows listings: stat properly there)
+                st = path if isinstance(path, FileRecord) and path.st_ino else os.stat(path)
+
+                # Unchanged since last scan? Costs one stat() + one index lookup
+                if self.cache is not None:
+                    t = now_ns()
+                    hit = self.cache.get(st)
+                    self.metrics.add("cache", now_ns() - t)
+                    if hit:
+                        digests, _, status, conf, color = hit
+                        algo = self.match_hash(digests) # Signature set may have grown since
+                        if algo:
+                            yield i, hash_verdict(algo)
+                        else:
+                            yield i, (status, conf, color)
+                        continue
+
+                tier = policy or policy_for(st.st_size)
+                if tier == "deferred":
+                    self.deferred.append(os.fspath(path))
+                    yield i, deferred_verdict(st.st_size)
+                    continue
+
+                source = self.open_digest(path) if tier == "full" else contextlib.nullcontext(self.sample_digest(path))
+                with source as digest:
+                    digests = digest.hexdigests()
+                    # Hash and signature checks; features are taken while the file is still mapped
+                    verdict, feats, hint = self.triage(digest, digests)
+                self.metrics.add_many(digest.timings)
+
+                if verdict:
+                    yield i, verdict
+                    continue
+
+                # AI Check (deferred to the batch)
+                if feats is None:
+                    yield i, self.finish_verdict(None, hint)
+                    continue
+                if not pending:
+                    started = time.monotonic()
+                pending.append((i, st, digests, feats, tier, hint))
+
+            except ScanCancelled:
+                raise # Stops the whole scan, not just this file
+            except Exception as e:
+                yield i, ("Error", str(e), "yellow")
+
+        if pending:
+            yield from self._flush_batch(pending)
+        if self.cache is not None:
+            self.cache.flush() # Don't sit on the write lock between scans (other engines share the file)
+
+    def scan_deferred(self, paths=None):
+        """ Scans deferred files with the sampled policy. Yields (path, verdict).
+            Drains self.deferred, or takes just the given paths out of it. """
+        if paths is None:
+            paths, self.deferred = self.deferred, []
+        else:
+            paths = [os.fspath(p) for p in paths]
+            taken = set(paths)
+            self.deferred = [p for p in self.deferred if p not in taken]
+        if not paths: return
+        for i, verdict in self.iter_scan(paths, policy="sampled"):
+            yield paths[i], verdict
+
+    def _flush_batch(self, pending):
+        import numpy as np
         try:
-            fname = os.path.basename(path)
-            dest = os.path.join(self.quarantine_dir, fname + ".quarantined")
-            shutil.move(path, dest)
-            return True, dest
+            verdicts = self.classify_batch(np.vstack([feats for _, _, _, feats, _, _ in pending]))
+        except Exception as e:
+            verdicts = [("Error", str(e), "yellow")] * len(pending)
+        # Record the policy behind a model verdict ("87.5% (sampled)"); full scans keep the plain form
+        verdicts = [(status, f"{conf} ({tier})", color) if tier != "full" and status in ("SAFE", "UNSAFE")
+                    else (status, conf, color) for (_, _, _, _, tier, _), (status, conf, color) in zip(pending, verdicts)]
+        verdicts = [self.finish_verdict(verdict, hint) for (_, _, _, _, _, hint), verdict in zip(pending, verdicts)]
+        if self.cache is not None:
+            t = now_ns()
+            for (_, st, digests, feats, _, _), verdict in zip(pending, verdicts):
+                if verdict[0] != "Error":
+                    self.cache.put(st, digests, feats, *verdict)
+            self.metrics.add("cache", now_ns() - t)
+        for (i, _, _, _, _, _), verdict in zip(pending, verdicts):
+            yield i, verdict
+
+    def classify_batch(self, feature_matrix):
+        """ One predict_proba call for an (N, 27) matrix. Returns [(status, confidence_str, color)] per row. """
+        self._ready.wait()
+        if not self.model:
+            return [("Unknown", "No Model", "gray")] * len(feature_matrix)
+        t = now_ns()
+        proba = self.model.predict_proba(feature_matrix)[:, 1]
+        self.metrics.add("inference", now_ns() - t)
+        verdicts = []
+        for p in proba:
+            conf = p * 100
+            if p > 0.5:
+                verdicts.append(("UNSAFE", f"{conf:.1f}%", "red"))
+            else:
+                verdicts.append(("SAFE", f"{100-conf:.1f}%", "green"))
+        return verdicts
+
+    @property
+    def vault(self):
+        """ The quarantine store (opened on first use). """
+        if self._vault is None:
+            from quarantine_vault import QuarantineVault
+            self._vault = QuarantineVault(self.quarantine_dir)
+        return self._vault
+
+    def quarantine_file(self, path, status="UNSAFE", conf=""):
+        """ Returns (True, stored object path) or (False, error). """
+        try:
+            t = now_ns()
+            entry = self.vault.entry(self.vault.quarantine(path, status, conf))
+            stored = self.vault.object_path(entry["sha256"])
+            self.metrics.add("quarantine", now_ns() - t, os.path.getsize(stored))
+            return True, stored
         except Exception as e:
             return False, str(e)
 
+    def quarantine_many(self, items):
+        """ Bulk quarantine of [(path, status, conf)] in one vault batch -> [(path, ok, entry_id or error message)].
+            Never raises: if the vault can't be used at all, every item comes back as failed. """
+        items = list(items)
+        t = now_ns()
+        try:
+            results = self.vault.quarantine_many(items)
+        except Exception as e:
+            results = [(path, False, str(e)) for path, _, _ in items]
+        self.metrics.add("quarantine", now_ns() - t)
+        return results
+
     def delete_file(self, path):
         try:
             if os.path.isdir(path):
@@ -1,4 +1,5 @@
 import os
+import mmap
 import hashlib
 import numpy as np
 import pandas as pd
@@ -18,27 +19,9 @@ MODEL_PATH = os.path.join(BASE, "scanner_model.pkl")
 MALWARE_CSV = os.path.join(BASE, "Malware dataset.csv")
 
 # ----------------------------
-# FEATURE EXTRACTION (MUST MATCH TRAIN_MODEL.PY)
+# FEATURE EXTRACTION (SHARED WITH TRAIN_MODEL.PY / SCANNER_ENGINE.PY)
 # ----------------------------
-def extract_features(data):
-    if not data:
-        return np.zeros(19)
-
-    arr = np.frombuffer(data, dtype=np.uint8)
-    size = len(data)
-
-    # 1. Byte Histogram (16 bins, normalized)
-    hist, _ = np.histogram(arr, bins=16, range=(0, 256), density=True)
-    
-    # 2. Entropy
-    probs = np.bincount(arr, minlength=256) / size
-    entropy = -np.sum(probs[probs > 0] * np.log2(probs[probs > 0]))
-
-    # 3. Structural Ratios
-    printable = np.sum((arr >= 32) & (arr <= 126)) / size
-    log_size = np.log1p(size)
-
-    return np.concatenate([hist, [entropy, printable, log_size]]).reshape(1, -1)
+from features import extract_features
 
 # ----------------------------
 # LOAD AI MODEL
@@ -86,7 +69,24 @@ def classify_ai(features):
         return f"SAFE ({100 - confidence:.1f}%)"
 
 # ----------------------------
-# SHADOW COPY READ
+# FILE READ (MEMORY-MAPPED)
+# ----------------------------
+def read_file(path):
+    """ Maps the file read-only so hashing/features read it in place.
+        Falls back to the shadow copy only when the file is locked. """
+    try:
+        with open(path, "rb") as f:
+            try:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                return f.read() # Empty or unmappable file
+    except PermissionError:
+        return read_file_shadow(path)
+    except Exception:
+        return None
+
+# ----------------------------
+# SHADOW COPY READ (LOCKED FILES)
 # ----------------------------
 def read_file_shadow(path):
     tmp_path = None
@@ -115,19 +115,23 @@ def read_file_shadow(path):
 # SCAN FILE
 # ----------------------------
 def scan_file(path):
-    data = read_file_shadow(path)
+    data = read_file(path)
     if data is None:
         return
 
-    # 1. Exact Hash Match (Instant)
-    md5 = hashlib.md5(data).hexdigest()
-    if md5 in malware_hashes:
-        print(f"[❌ UNSAFE | HASH MATCH] {path}")
-        return
-
-    # 2. AI Analysis
-    features = extract_features(data)
-    result = classify_ai(features)
+    try:
+        # 1. Exact Hash Match (Instant)
+        md5 = hashlib.md5(data).hexdigest()
+        if md5 in malware_hashes:
+            print(f"[❌ UNSAFE | HASH MATCH] {path}")
+            return
+
+        # 2. AI Analysis
+        features = extract_features(data).reshape(1, -1) # One (1, 27) row for predict_proba
+        result = classify_ai(features)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
 
     # Display
     color_icon = "✅" if result.startswith("SAFE") else "❌"
@@ -143,8 +147,15 @@ if __name__ == "__main__":
         scan_file(target)
 
     elif os.path.isdir(target):
-        for root, _, files in os.walk(target):
-            for f in files:
-                scan_file(os.path.join(root, f))
+        # Folder scans fan out across all cores
+        from parallel_scanner import ParallelScanner
+        for path, status, conf, _ in ParallelScanner().scan(target):
+            if status == "Error":
+                continue
+            if conf.startswith("100% (Hash"):
+                print(f"[❌ UNSAFE | HASH MATCH] {path}")
+            else:
+                color_icon = "✅" if status == "SAFE" else "❌"
+                print(f"[{color_icon} {status} ({conf})] {path}")
     else:
         print("❌ Invalid path")
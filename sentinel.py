@@ -0,0 +1,278 @@
+import os
+import sys
+import time
+import queue
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+DEBOUNCE = 0.3         # Seconds a file must stay quiet after its last write before it is scanned
+MAX_QUEUE = 1024       # Files waiting for the scanner; beyond this they stay coalesced in `pending`
+SCAN_BATCH = 64        # Files handed to engine.scan_many at once
+POLL_INTERVAL = 2.0    # Fallback watcher (no inotify)
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_MOVED_FROM | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len
+
+
+class Inotify:
+    """ Minimal ctypes binding: add/remove watches and read raw events from the fd. """
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._add(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm(self.fd, wd)
+
+    def read_events(self):
+        """ Returns [(wd, mask, name)] for everything queued, [] if nothing is ready. """
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, off = [], 0
+        while off < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, off)
+            off += _EVENT.size
+            name = buf[off:off + length].rstrip(b"\0")
+            off += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def inotify_available():
+    return sys.platform.startswith("linux")
+
+
+class _WakePipe:
+    """ Self-pipe that unblocks the watcher's select(). Closed by stop() once the watcher has exited,
+        or by the watcher itself when stop() gave up waiting for it (so no thread uses a closed fd). """
+    def __init__(self):
+        self.r, self.w = os.pipe()
+        self._lock = threading.Lock()
+        self._exited = self._abandoned = self._closed = False
+
+    def wake(self):
+        with self._lock:
+            if not self._closed: os.write(self.w, b"x")
+
+    def watcher_exited(self):
+        with self._lock:
+            self._exited = True
+            if self._abandoned: self._close()
+
+    def release(self):
+        """ Called by stop() after the join: closes now, or hands the fds to the still-running watcher. """
+        with self._lock:
+            if self._exited: self._close()
+            else: self._abandoned = True
+
+    def _close(self):
+        if self._closed: return
+        os.close(self.r)
+        os.close(self.w)
+        self._closed = True
+
+
+class Sentinel:
+    """ Real-time monitor. Watches trees recursively, waits until writes settle (close-write + debounce),
+        coalesces repeated events and scans the files in batches through engine.scan_many.
+        Files the engine defers (over DEFER_BYTES) are reported as "Deferred", then again with their sampled verdict.
+        on_verdict(path, (status, conf, color)) is called from the sentinel's scan thread. """
+    def __init__(self, engine, roots, on_verdict, debounce=DEBOUNCE, max_queue=MAX_QUEUE):
+        self.engine = engine
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.on_verdict = on_verdict
+        self.debounce = debounce
+        self.pending = {}                            # path -> time it becomes scannable
+        self.queue = queue.Queue(maxsize=max_queue)  # settled paths -> scan thread
+        self._stop = threading.Event()
+        self._threads = []
+        self._wake = None
+
+    # --- lifecycle ---
+    def start(self):
+        self._stop.clear()
+        self._wake = _WakePipe() # Per run: a watcher outliving stop() keeps its own pipe
+        watch = self._inotify_loop if inotify_available() else self._poll_loop
+        self._threads = [threading.Thread(target=self._watch, args=(watch, self._wake), daemon=True),
+                         threading.Thread(target=self._scan_loop, daemon=True)]
+        for t in self._threads: t.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wake is None: return # Never started
+        self._wake.wake() # Unblock select()
+        for t in self._threads: t.join(timeout=2)
+        self._threads = []
+        self._wake.release() # Closed now if the watcher exited, else by the watcher on its way out
+        self._wake = None
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    # --- debounce / coalescing ---
+    def _touch(self, path):
+        # Repeated events for the same file collapse into one entry; each write pushes the deadline out
+        self.pending[path] = time.monotonic() + self.debounce
+
+    def _release_due(self):
+        """ Moves settled files to the scan queue. Returns seconds until the next deadline (None if idle). """
+        now = time.monotonic()
+        for path, due in list(self.pending.items()):
+            if due <= now:
+                try:
+                    self.queue.put_nowait(path)
+                except queue.Full:
+                    break # Scanner is behind: keep them coalesced here and retry shortly
+                del self.pending[path]
+        if not self.pending:
+            return None
+        return max(0.05, min(self.pending.values()) - now)
+
+    # --- watchers ---
+    def _watch(self, loop, wake):
+        try:
+            loop(wake)
+        finally:
+            wake.watcher_exited()
+
+    def _inotify_loop(self, wake):
+        ino = Inotify()
+        dirs = {} # wd -> directory path
+
+        def watch_tree(top, announce):
+            for cur, subdirs, files in os.walk(top):
+                try:
+                    dirs[ino.add_watch(cur)] = cur
+                except OSError as e:
+                    if e.errno == errno.ENOSPC: return # Out of watches (fs.inotify.max_user_watches)
+                    subdirs[:] = []
+                    continue
+                if announce: # Files that landed before the watch existed
+                    for f in files: self._touch(os.path.join(cur, f))
+
+        for root in self.roots:
+            if os.path.isdir(root): watch_tree(root, announce=False)
+
+        try:
+            while not self._stop.is_set():
+                timeout = self._release_due()
+                ready, _, _ = select.select([ino.fd, wake.r], [], [], timeout)
+                if wake.r in ready:
+                    os.read(wake.r, 64)
+                for wd, mask, name in ino.read_events():
+                    if mask & IN_Q_OVERFLOW:
+                        # Kernel dropped events: rescan everything once
+                        for root in self.roots: watch_tree(root, announce=True)
+                        continue
+                    if mask & IN_IGNORED:
+                        dirs.pop(wd, None)
+                        continue
+                    parent = dirs.get(wd)
+                    if parent is None or not name:
+                        continue
+                    path = os.path.join(parent, name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            watch_tree(path, announce=True)
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        self._touch(path)
+                    elif mask & IN_MODIFY and path in self.pending:
+                        self._touch(path) # Still being written
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self.pending.pop(path, None)
+        finally:
+            ino.close()
+
+    def _poll_loop(self, wake):
+        """ Portable fallback: recursive (size, mtime) snapshot diff every POLL_INTERVAL (sleeps on the stop event, not wake). """
+        def snapshot():
+            seen = {}
+            for root in self.roots:
+                for cur, _, files in os.walk(root):
+                    for f in files:
+                        p = os.path.join(cur, f)
+                        try:
+                            st = os.stat(p)
+                            seen[p] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            pass
+            return seen
+
+        last = snapshot()
+        while not self._stop.is_set():
+            self._release_due()
+            self._stop.wait(POLL_INTERVAL)
+            current = snapshot()
+            for p, sig in current.items():
+                if last.get(p) != sig:
+                    self._touch(p)
+            last = current
+
+    # --- scanner ---
+    def _scan_loop(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < SCAN_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [p for p in dict.fromkeys(batch) if os.path.isfile(p)]
+            verdicts = list(zip(batch, self.engine.scan_many(batch)))
+            self._report(verdicts)
+            # Huge files got "Deferred": sample them now that the rest of the batch is reported
+            deferred = [path for path, (status, _, _) in verdicts if status == "Deferred"]
+            if deferred:
+                self._report(self.engine.scan_deferred(deferred))
+
+    def _report(self, verdicts):
+        for path, verdict in verdicts:
+            try:
+                self.on_verdict(path, verdict)
+            except Exception:
+                pass
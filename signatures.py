@@ -0,0 +1,214 @@
+import os
+import re
+import ast
+import hashlib
+import numpy as np
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BASE = os.path.dirname(os.path.abspath(__file__))
+SIGNATURES_PATH = os.path.join(BASE, "signatures.txt")
+LEVELS = ("malware", "suspicious") # See signatures.txt: only "malware" hits decide a verdict on their own
+ANCHOR = 4                 # Every pattern needs this many consecutive literal bytes (its anchor)
+FILTER_BITS = 20           # Anchor pre-filter: 1M-entry table (1 MB, cache friendly), ~0.5% false candidates at 5k patterns
+_HASH_MUL = np.uint32(2654435761)
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+# Bytes that are everywhere (padding, NOP, space, ASCII text): anchors avoid them where they can
+_COMMON = np.ones(256)
+_COMMON[[0x00, 0xFF, 0x90, 0x20]] = 4.0
+_COMMON[list(b"etaoinsrhld0123456789")] = 2.0
+
+
+# ----------------------------
+# PATTERNS
+# ----------------------------
+def parse_pattern(text):
+    """ '"literal"' (Python escapes: \\x00, \\n, \\") or hex bytes with ?? wildcards ('4D 5A ?? 00')
+        -> list of byte values, None for a wildcard. """
+    text = text.strip()
+    if text[:1] in ("'", '"'):
+        return list(ast.literal_eval("b" + text))
+    tokens = text.replace(" ", "")
+    if len(tokens) % 2:
+        raise ValueError(f"Odd number of hex digits: {text!r}")
+    return [None if tokens[i:i + 2] == "??" else int(tokens[i:i + 2], 16) for i in range(0, len(tokens), 2)]
+
+
+def _anchor(pattern):
+    """ Offset of the least common run of ANCHOR literal bytes in the pattern. """
+    best, best_cost = None, None
+    for k in range(len(pattern) - ANCHOR + 1):
+        window = pattern[k:k + ANCHOR]
+        if None in window: continue
+        cost = _COMMON[window].sum() + ANCHOR - len(set(window)) # Repeated bytes are weak anchors too
+        if best_cost is None or cost < best_cost:
+            best, best_cost = k, cost
+    if best is None:
+        raise ValueError(f"Pattern needs {ANCHOR} consecutive literal bytes")
+    return best
+
+
+class SignatureSet:
+    """ Many byte / hex-wildcard patterns compiled into one multi-pattern matcher.
+        Every pattern is indexed by a 4-byte anchor. A scan hashes the 4-gram at every offset in one
+        vectorized pass, keeps offsets whose hash is in the anchor table, confirms the exact anchor with
+        a sorted lookup, and only then verifies the surrounding pattern. Cost per byte is flat in the
+        number of patterns (a pure-Python Aho-Corasick walk runs at a few MB/s). """
+    def __init__(self, signatures):
+        """ signatures: [(name, pattern)] or [(name, pattern, level)]; level defaults to "malware". """
+        self.names, self.lengths, self._verify = [], [], []
+        self.suspicious = set() # Names of the low-specificity ("suspicious") signatures
+        by_anchor = {}
+        for name, pattern, *level in signatures:
+            level = level[0] if level else LEVELS[0]
+            if level not in LEVELS:
+                raise ValueError(f"{name}: unknown level {level!r}")
+            if level == "suspicious":
+                self.suspicious.add(name)
+            if isinstance(pattern, str):
+                pattern = parse_pattern(pattern)
+            elif isinstance(pattern, (bytes, bytearray)):
+                pattern = list(pattern)
+            k = _anchor(pattern)
+            value = int.from_bytes(bytes(pattern[k:k + ANCHOR]), "little")
+            by_anchor.setdefault(value, []).append((len(self.names), k))
+            self.names.append(name)
+            self.lengths.append(len(pattern))
+            if None in pattern:
+                regex = re.compile(b"".join(b"." if b is None else re.escape(bytes([b])) for b in pattern), re.DOTALL)
+                self._verify.append(lambda buf, start, m=regex.match: m(buf, start) is not None)
+            else:
+                # Slice compare: works on bytes and on memoryviews of mapped files alike
+                literal = bytes(pattern)
+                self._verify.append(lambda buf, start, s=literal: buf[start:start + len(s)] == s)
+        self.by_anchor = by_anchor
+        self.anchors = np.array(sorted(by_anchor), dtype=np.uint32)
+        self.filter = np.zeros(1 << FILTER_BITS, dtype=bool)
+        self.filter[self._hash(self.anchors)] = True
+        self.max_len = max(self.lengths, default=ANCHOR)
+        self.fingerprint = hashlib.md5(repr(sorted(signatures, key=str)).encode()).hexdigest()
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _hash(values):
+        return (values * _HASH_MUL) >> np.uint32(32 - FILTER_BITS)
+
+    @classmethod
+    def load(cls, path=SIGNATURES_PATH):
+        """ Reads `name: pattern` lines ('#' comments and blank lines ignored); a `[level]` line sets the
+            level of the signatures after it (malware until the first one). """
+        signatures = []
+        level = LEVELS[0]
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"): continue
+                if line.startswith("[") and line.endswith("]"):
+                    level = line[1:-1].strip()
+                    if level not in LEVELS:
+                        raise ValueError(f"{path}:{n}: unknown level {level!r} (expected one of {LEVELS})")
+                    continue
+                name, sep, pattern = line.partition(":")
+                if not sep:
+                    raise ValueError(f"{path}:{n}: expected 'name: pattern'")
+                signatures.append((name.strip(), pattern.strip(), level))
+        return cls(signatures)
+
+    def scanner(self):
+        return SignatureScan(self)
+
+    def scan(self, data):
+        """ [(offset, name)] for a whole buffer. """
+        s = self.scanner()
+        s.feed(data)
+        return s.finish()
+
+    def _candidates(self, buf, first=0, last=None):
+        """ Offsets in [first, last) of buf (bytes or a memoryview, not copied) where a real anchor starts,
+            with the anchor values. """
+        n = len(buf) - ANCHOR + 1
+        if last is not None: n = min(n, last)
+        if n <= first:
+            return _EMPTY, _EMPTY
+        # Unaligned uint32 view: the 4-gram at every offset, no copy
+        grams = np.ndarray((n - first,), dtype="<u4", buffer=buf, offset=first, strides=(1,))
+        h = np.multiply(grams, _HASH_MUL)
+        np.right_shift(h, 32 - FILTER_BITS, out=h)
+        hits = np.flatnonzero(np.take(self.filter, h))
+        if not len(hits):
+            return _EMPTY, _EMPTY
+        values = grams[hits]
+        idx = np.minimum(np.searchsorted(self.anchors, values), len(self.anchors) - 1)
+        real = self.anchors[idx] == values # Drop hash collisions
+        return hits[real] + first, values[real]
+
+
+class SignatureScan:
+    """ Matching state for one stream: feed() chunks in order (as they are hashed), finish() returns
+        [(offset, name)] sorted by offset. Matches spanning chunk boundaries are found; each signature is
+        reported once, at its first offset. Chunks are scanned in place: only the overlap between a chunk
+        and the previous one (max_len - 1 bytes either side) is copied. """
+    def __init__(self, sigset):
+        self.sigset = sigset
+        self.overlap = sigset.max_len - 1 + ANCHOR - 1 # Bytes carried over: any match straddling a boundary fits
+        self.carry = b""      # Last `overlap` bytes of the stream so far
+        self.offset = 0       # Stream offset of the next chunk
+        self.pending = []     # (pattern id, stream start): anchor seen, pattern runs past the stream so far
+        self.found = {}       # pattern id -> first offset
+        self._done = set()    # Anchor values whose patterns have all matched
+
+    def feed(self, chunk):
+        if not len(self.sigset) or not len(chunk): return
+        chunk = memoryview(chunk).cast("B")
+        start = self.offset
+        # 1. Boundary: carry + head of this chunk, for patterns that began in earlier chunks and anchors
+        #    whose 4 bytes straddle the boundary
+        if self.carry:
+            edge = self.carry + bytes(chunk[:self.overlap])
+            edge_start = start - len(self.carry)
+            pending, self.pending = self.pending, []
+            for pid, at in pending:
+                self._try(edge, edge_start, pid, at)
+            boundary = len(self.carry)
+            self._match(edge, edge_start, first=max(0, boundary - (ANCHOR - 1)), last=boundary)
+        # 2. The chunk itself, in place; patterns that begin before it are checked against the boundary buffer
+        self._match(chunk, start, fallback=(edge, edge_start) if self.carry else None)
+        end = start + len(chunk)
+        self.carry = (self.carry + bytes(chunk[-self.overlap:]))[-self.overlap:]
+        self.offset = end
+
+    def finish(self):
+        self.pending = [] # Patterns still running past the end of the stream can't match
+        return sorted((off, self.sigset.names[pid]) for pid, off in self.found.items())
+
+    def _try(self, buf, buf_start, pid, at):
+        """ Verifies pattern pid at stream offset `at` against buf (which starts at stream offset buf_start). """
+        if pid in self.found: return True
+        rel = at - buf_start
+        if rel < 0: return False
+        if rel + self.sigset.lengths[pid] > len(buf):
+            self.pending.append((pid, at)) # Runs past what we have: retried with the next chunk
+            return True
+        if self.sigset._verify[pid](buf, rel):
+            self.found[pid] = at
+        return True
+
+    def _match(self, buf, buf_start, first=0, last=None, fallback=None):
+        positions, values = self.sigset._candidates(buf, first, last)
+        if self._done and len(values):
+            keep = ~np.isin(values, list(self._done))
+            positions, values = positions[keep], values[keep]
+        by_anchor = self.sigset.by_anchor
+        for pos, value in zip(positions.tolist(), values.tolist()):
+            if value in self._done: continue
+            entries = by_anchor[value]
+            for pid, k in entries:
+                at = buf_start + pos - k
+                if not self._try(buf, buf_start, pid, at) and fallback is not None:
+                    self._try(fallback[0], fallback[1], pid, at) # Starts before buf: the boundary buffer has it
+            if all(pid in self.found for pid, _ in entries):
+                self._done.add(value)
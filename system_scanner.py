@@ -1,46 +1,104 @@
 import psutil
 import os
 import shutil
-import socket
 import threading
-import subprocess
-import re
-from scanner_engine import ScannerEngine
+import itertools
+from scanner_engine import ScannerEngine, BATCH_SIZE
+from parallel_scanner import ParallelScanner
+from file_walker import WalkRules
+from net_discovery import discover_devices
+from proc_memory import deep_scan_available, read_maps, select_regions, iter_region_features
 
 class SystemScanner:
-    def __init__(self):
-        self.engine = ScannerEngine()
+    def __init__(self, engine=None):
+        # Pass the app's engine to share one model/signature set
+        self.engine = engine if engine is not None else ScannerEngine()
 
     # -------------------------
     # MEMORY (RAM/KERNEL) SCAN
     # -------------------------
-    def scan_memory(self, callback=None):
-        """ Scans all running processes (backing executable files). """
+    def scan_memory(self, callback=None, deep=False):
+        """ Scans all running processes. Processes running the same image (path, inode, mtime) share one
+            scan of the backing executable; the verdict is reported for each of their PIDs.
+            deep=True also reads executable and anonymous mappings from /proc/<pid>/mem (Linux). """
         threats = []
         count = 0
-        
-        # Iterate over all running processes
+
+        # 1. Group processes by the executable image they run
+        images = {} # (exe, dev, inode, mtime_ns) -> [(pid, name)]
         for proc in psutil.process_iter(['pid', 'name', 'exe']):
             try:
                 exe_path = proc.info.get('exe')
-                if exe_path and os.path.exists(exe_path):
-                    status, conf, color = self.engine.scan_file(exe_path)
-                    count += 1
-                    
-                    if status == "UNSAFE":
+                if exe_path:
+                    st = os.stat(exe_path)
+                    key = (exe_path, st.st_dev, st.st_ino, st.st_mtime_ns)
+                    images.setdefault(key, []).append((proc.info['pid'], proc.info['name']))
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, OSError):
+                pass
+
+        # 2. One scan per unique image, fanned out to every PID running it
+        keys = list(images)
+        deferred = {} # exe -> key index, for images over DEFER_BYTES: sampled once the rest are done
+
+        def sampled():
+            for path, verdict in self.engine.scan_deferred(list(deferred)):
+                yield deferred[path], verdict
+
+        for i, verdict in itertools.chain(self.engine.iter_scan([k[0] for k in keys]), sampled()):
+            status, conf, color = verdict
+            if status == "Deferred":
+                deferred[keys[i][0]] = i
+                continue
+            procs = images[keys[i]]
+            count += 1
+            if status == "UNSAFE":
+                for pid, _ in procs:
+                    threats.append({
+                        "type": "Process (RAM)",
+                        "path": keys[i][0],
+                        "pid": pid,
+                        "conf": conf
+                    })
+
+            if callback:
+                callback(f"Scanning RAM: {procs[0][1]} (x{len(procs)})...", count)
+
+        if deep:
+            threats += self.scan_memory_regions([pid for procs in images.values() for pid, _ in procs], callback)
+        return threats
+
+    def scan_memory_regions(self, pids, callback=None):
+        """ Deep mode: classifies process memory regions (shared code read once, anonymous memory per process). """
+        if not deep_scan_available():
+            if callback: callback("Deep memory scan needs /proc (Linux only).", 0)
+            return []
+        owners, regions = {}, []
+        for pid in pids:
+            regions += select_regions(pid, read_maps(pid), owners)
+        threats, count, batch = [], 0, []
+
+        def flush():
+            import numpy as np
+            matrix = np.vstack([feats for _, feats in batch])
+            for (region, _), (status, conf, _) in zip(batch, self.engine.classify_batch(matrix)):
+                if status == "UNSAFE":
+                    key, _, start, end, label = region
+                    for pid in owners[key]: # Shared code: every process that maps it
                         threats.append({
-                            "type": "Process (RAM)",
-                            "path": exe_path,
-                            "pid": proc.info['pid'],
+                            "type": "Memory Region",
+                            "path": f"{label} [{start:x}-{end:x}]",
+                            "pid": pid,
                             "conf": conf
                         })
-                    
-                    if callback:
-                        callback(f"Scanning RAM: {proc.info['name']}...", count)
-                        
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-                
+            batch.clear()
+
+        for region, feats in iter_region_features(regions):
+            batch.append((region, feats))
+            count += 1
+            if len(batch) >= BATCH_SIZE: flush()
+            if callback and count % 50 == 0:
+                callback(f"Scanning memory regions... ({count}/{len(regions)})", count)
+        if batch: flush()
         return threats
 
     # -------------------------
@@ -64,52 +122,33 @@ class SystemScanner:
         for drive in drives:
             if callback: callback(f"Scanning USB: {drive}", 0)
             
-            for root, _, files in os.walk(drive):
-                for f in files:
-                    path = os.path.join(root, f)
-                    try:
-                        status, conf, color = self.engine.scan_file(path)
-                        total_files += 1
-                        
-                        if status == "UNSAFE":
-                            threats.append({
-                                "type": "USB File",
-                                "path": path,
-                                "conf": conf
-                            })
-                    except: pass
-                    
-                    if total_files % 50 == 0 and callback:
-                        callback(f"Scanning USB... ({total_files} checked)", total_files)
-                        
+            # Stays on the stick: mounts nested under it are not part of the drive
+            rules = WalkRules(one_fs=True)
+            scanner = ParallelScanner(metrics=self.engine.metrics)
+            # Files over the size ceiling come back "Deferred": sample them after the rest of the drive
+            for path, status, conf, color in itertools.chain(scanner.scan(drive, rules=rules), scanner.scan_deferred()):
+                if status == "Deferred": continue
+                total_files += 1
+
+                if status == "UNSAFE":
+                    threats.append({
+                        "type": "USB File",
+                        "path": path,
+                        "conf": conf
+                    })
+
+                if total_files % 50 == 0 and callback:
+                    callback(f"Scanning USB... ({total_files} checked)", total_files)
+
         return threats, f"Scanned {total_files} files on USB."
 
     # -------------------------
     # NETWORK SCAN
     # -------------------------
-    def scan_network_arp(self):
-        """ Scans local network using ARP table (Fast/Safe). """
-        devices = []
+    def scan_network_arp(self, callback=None):
+        """ Lists devices from the ARP table; hostnames are resolved concurrently (net_discovery).
+            callback(device) fires as each host resolves, so the UI can fill in while slow lookups time out. """
         try:
-            # Run 'arp -a' to see cached devices
-            output = subprocess.check_output("arp -a", shell=True).decode()
-            
-            # Regex to find IPs (Simple version)
-            ips = re.findall(r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})", output)
-            
-            # Simple unique filter excluding loopback/multicast
-            seen = set()
-            for ip in ips:
-                if ip not in seen and not ip.startswith("224.") and not ip.startswith("239.") and ip != "255.255.255.255":
-                    seen.add(ip)
-                    try:
-                        hostname = socket.gethostbyaddr(ip)[0]
-                    except:
-                        hostname = "Unknown Device"
-                    
-                    devices.append({"ip": ip, "hostname": hostname, "status": "Online"})
-                    
+            return discover_devices(on_device=callback)
         except Exception as e:
             return [{"ip": "Error", "hostname": str(e), "status": "Failed"}]
-            
-        return devices
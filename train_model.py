@@ -1,10 +1,14 @@
 import os
+import sys
 import numpy as np
 import pickle
 import joblib
 from sklearn.ensemble import RandomForestClassifier
+from compiled_model import compile_model
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
+# Cached, parallel extraction (features shared with ScannerEngine)
+from feature_store import CHUNK_ROWS, FeatureStore, index_dataset, iter_chunks, list_samples, load_dataset
 
 # ----------------------------
 # CONFIG
@@ -13,89 +17,101 @@ BASE = os.path.dirname(os.path.abspath(__file__))
 BENIGN_DIR = os.path.join(BASE, "dataset", "benign")
 MALWARE_DIR = os.path.join(BASE, "dataset", "malware")
 MODEL_PATH = os.path.join(BASE, "scanner_model.pkl")
+TREES_PER_CHUNK = 10       # Streaming mode: trees added per chunk of feature rows
 
 # ----------------------------
-# FEATURE EXTRACTOR (THE "PROPERTIES" DNA)
+# DATA LOADER
 # ----------------------------
-def extract_features(data):
-    if not data:
-        return np.zeros(19) # 16 bins + 3 stats
+def load_samples():
+    print(f"[*] Loading BENIGN from {BENIGN_DIR}...")
+    samples = list_samples(BENIGN_DIR, 0) # 0 = SAFE
+    print(f"[*] Loading MALWARE from {MALWARE_DIR}...")
+    samples += list_samples(MALWARE_DIR, 1) # 1 = MALWARE
+    return samples
 
-    arr = np.frombuffer(data, dtype=np.uint8)
-    size = len(data)
+def load_data():
+    """ dataset/benign (0) + dataset/malware (1). Only new or changed files are re-extracted (feature_store). """
+    return load_dataset(load_samples())
 
-    # 1. Byte Histogram (16 bins, normalized)
-    # We bin 0-255 into 16 groups (0-15, 16-31...) to see "byte distribution"
-    hist, _ = np.histogram(arr, bins=16, range=(0, 256), density=True)
-    
-    # 2. Entropy (Randomness)
-    probs = np.bincount(arr, minlength=256) / size
-    entropy = -np.sum(probs[probs > 0] * np.log2(probs[probs > 0]))
+# ----------------------------
+# STREAMING TRAIN (out-of-core)
+# ----------------------------
+def train_streaming(samples, chunk_rows=CHUNK_ROWS, trees_per_chunk=TREES_PER_CHUNK, resume=False, store=None,
+                    model_path=MODEL_PATH):
+    """ Warm-started forest that grows TREES_PER_CHUNK trees per chunk of feature rows read from the store,
+        so memory is bounded by chunk_rows rather than the corpus. resume=True loads the saved model and only
+        adds trees for rows stored since it was trained. Returns the classifier, or None if there is nothing to learn. """
+    own_store = store is None
+    store = store if store is not None else FeatureStore()
+    try:
+        rows, labels = index_dataset(samples, store)
+        if len(np.unique(labels)) < 2:
+            print("❌ ERROR: Streaming training needs both SAFE and MALWARE samples.")
+            return None
 
-    # 3. Structural Ratios
-    printable = np.sum((arr >= 32) & (arr <= 126)) / size
-    # logical size usually better than raw size
-    log_size = np.log1p(size)
+        clf, seen = None, 0
+        if resume and os.path.exists(model_path):
+            clf = joblib.load(model_path)
+            seen = getattr(clf, "trained_rows_", 0)
+        if clf is None:
+            clf = RandomForestClassifier(n_estimators=0, random_state=42)
+        clf.warm_start = True
 
-    # Combine all features: 16 hist values + entropy + printable + log_size
-    return np.concatenate([hist, [entropy, printable, log_size]])
+        new = rows >= seen
+        print(f"[+] Streaming {int(new.sum())} of {len(rows)} samples in chunks of {chunk_rows}...")
+        if not new.any():
+            print("[*] No new samples since the last run.")
+            return clf
 
-# ----------------------------
-# DATA LOADER
-# ----------------------------
-def load_data():
-    X, y = [], []
-    
-    # Load Benign (Label 0)
-    print(f"[*] Loading BENIGN from {BENIGN_DIR}...")
-    if os.path.exists(BENIGN_DIR):
-        for f in os.listdir(BENIGN_DIR):
-            try:
-                with open(os.path.join(BENIGN_DIR, f), "rb") as file:
-                    feat = extract_features(file.read())
-                    X.append(feat)
-                    y.append(0) # 0 = SAFE
-            except Exception as e:
-                pass
+        rng = np.random.default_rng(42)
+        for i, (X, y) in enumerate(iter_chunks(store, rows[new], labels[new], chunk_rows)):
+            if len(np.unique(y)) < 2:
+                # A forest refit resets classes_ from y: replay stored rows of the other class so both are present
+                other = np.flatnonzero(labels != y[0])
+                pick = np.sort(rng.choice(other, size=min(len(other), len(y)), replace=False))
+                X = np.vstack([X, store.matrix()[rows[pick]]])
+                y = np.concatenate([y, labels[pick]])
+            clf.n_estimators += trees_per_chunk
+            clf.fit(X, y)
+            print(f"    chunk {i + 1}: {len(y)} rows -> {clf.n_estimators} trees")
 
-    # Load Malware (Label 1)
-    print(f"[*] Loading MALWARE from {MALWARE_DIR}...")
-    if os.path.exists(MALWARE_DIR):
-        for f in os.listdir(MALWARE_DIR):
-            try:
-                with open(os.path.join(MALWARE_DIR, f), "rb") as file:
-                    feat = extract_features(file.read())
-                    X.append(feat)
-                    y.append(1) # 1 = MALWARE
-            except:
-                pass
-                
-    return np.array(X), np.array(y)
+        clf.trained_rows_ = len(store) # Rows stored after this point are "new" for the next --resume
+        return clf
+    finally:
+        if own_store: store.close()
 
 # ----------------------------
 # TRAIN
 # ----------------------------
 if __name__ == "__main__":
-    print("--- AI TRAINING STARTED ---")
-    X, y = load_data()
+    if "--stream" in sys.argv:
+        # Out-of-core: python train_model.py --stream [--resume]
+        print("--- AI TRAINING STARTED (streaming) ---")
+        clf = train_streaming(load_samples(), resume="--resume" in sys.argv)
+        if clf is None:
+            exit()
+    else:
+        print("--- AI TRAINING STARTED ---")
+        X, y = load_data()
+
+        if len(X) == 0:
+            print("❌ ERROR: No data found in 'dataset/benign' or 'dataset/malware'.")
+            print("   Please add files to train the model.")
+            exit()
+
+        print(f"[+] Total Samples: {len(X)}")
+
+        # Train
+        clf = RandomForestClassifier(n_estimators=100, random_state=42)
+        clf.fit(X, y)
 
-    if len(X) == 0:
-        print("❌ ERROR: No data found in 'dataset/benign' or 'dataset/malware'.")
-        print("   Please add files to train the model.")
-        exit()
+        # Evaluate (Self-Check)
+        y_pred = clf.predict(X)
+        acc = accuracy_score(y, y_pred)
+        print(f"\n[+] Training Accuracy: {acc * 100:.2f}%")
 
-    print(f"[+] Total Samples: {len(X)}")
-    
-    # Train
-    clf = RandomForestClassifier(n_estimators=100, random_state=42)
-    clf.fit(X, y)
-    
-    # Evaluate (Self-Check)
-    y_pred = clf.predict(X)
-    acc = accuracy_score(y, y_pred)
-    print(f"\n[+] Training Accuracy: {acc * 100:.2f}%")
-    
     # Save
     joblib.dump(clf, MODEL_PATH)
+    compile_model(MODEL_PATH) # Flat forest for ScannerEngine (no scikit-learn at scan time)
     print(f"\n[✅] Model saved to: {MODEL_PATH}")
     print("    You can now run 'scanner_v3.py'!")
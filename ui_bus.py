@@ -0,0 +1,47 @@
+import queue
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+FRAME_MS = 33                   # The Tk thread drains the bus about 30 times a second
+MAX_EVENTS_PER_FRAME = 2000     # Anything beyond this waits for the next frame (keeps the UI responsive)
+LOG_LINES = 2000                # Text logs keep only the newest lines
+
+
+class UIBus:
+    """ Hands UI updates from worker threads to the Tk thread. Tkinter widgets must only be touched by
+        the thread running mainloop(), so workers post((kind, args)) and the Tk thread applies them in
+        batches (see AntivirusApp._pump_ui). post() never blocks and is safe from any thread. """
+    def __init__(self):
+        self._q = queue.SimpleQueue()
+
+    def post(self, kind, *args):
+        self._q.put((kind, args))
+
+    def drain(self, limit=MAX_EVENTS_PER_FRAME):
+        """ Up to limit pending events, oldest first, grouped as {kind: [args, ...]} (dicts keep the
+            order kinds first appeared; each kind keeps its own event order). """
+        batch = {}
+        for _ in range(limit):
+            try:
+                kind, args = self._q.get_nowait()
+            except queue.Empty:
+                break
+            batch.setdefault(kind, []).append(args)
+        return batch
+
+
+def append_lines(text, lines, max_lines=LOG_LINES):
+    """ Appends lines to a tk.Text with a single insert, then trims the top so at most max_lines remain
+        (a ring buffer: memory and redraw cost stay flat through long scans). Disabled widgets stay disabled. """
+    lines = lines[-max_lines:]
+    if not lines: return
+    locked = str(text.cget("state")) == "disabled"
+    if locked: text.config(state="normal")
+    text.insert("end", "".join(f"> {line}\n" for line in lines))
+    # "end-1c" sits on the empty line after the final newline: line count = its row - 1
+    extra = int(text.index("end-1c").split(".")[0]) - 1 - max_lines
+    if extra > 0:
+        text.delete("1.0", f"{extra + 1}.0")
+    text.see("end")
+    if locked: text.config(state="disabled")